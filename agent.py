@@ -1,6 +1,7 @@
 import random
 import support
 from prob.risk import pick_min_risk
+from prob.fingerprint import knowledge_fingerprint, update_fingerprint
 from collections import deque
 
 
@@ -18,6 +19,8 @@ class Agent:
         self.n_row = n_row
         self.n_col = n_col
         self.knowledge = [["?" for _ in range(n_col)] for _ in range(n_row)]
+        # Impronta della knowledge, aggiornata a ogni modifica: chiave O(1) per le cache del reasoning PB
+        self.fingerprint = knowledge_fingerprint(self.knowledge)
         self.moves_made = set()
         self.safe_cells = set()
         self.mine_cells = set()
@@ -26,6 +29,16 @@ class Agent:
         
         # Configurazione strategia
         self.strategy = strategy
+        # MRV + Degree e LCV: la strategia non cambia durante la partita, quindi il controllo si fa una volta sola
+        self.use_heuristics = strategy in ["backtracking_advanced", "backtracking_gac3"]
+        # Per lo stesso motivo il metodo di scelta dell'azione si risolve qui, una volta sola:
+        # choose_action lo chiama direttamente invece di confrontare la stringa a ogni mossa
+        if strategy in ["backtracking", "backtracking_advanced", "backtracking_gac3"]:
+            self._choose_action_impl = self._choose_action_backtracking
+        elif strategy == "random":
+            self._choose_action_impl = self._choose_action_random
+        else:
+            self._choose_action_impl = None
         
         # Ottimizzazione: mantieni set di celle sconosciute
         self.unknown_cells = {(i, j) for i in range(n_row) for j in range(n_col)}
@@ -38,6 +51,37 @@ class Agent:
         self.Domains = {(x, y): {0, 1} for x in range(n_row) for y in range(n_col)}
         self.gac_count = 0
 
+    def reset(self):
+        """
+        Riporta l'agente allo stato iniziale per una nuova partita sulla stessa griglia,
+        riusando le strutture già allocate (knowledge, set, domini) invece di ricrearle.
+        """
+        for row in self.knowledge:
+            row[:] = ["?"] * self.n_col
+        self.fingerprint = knowledge_fingerprint(self.knowledge)
+        self.moves_made.clear()
+        self.safe_cells.clear()
+        self.mine_cells.clear()
+        self.to_flag = self.total_mines
+        self.unknown_cells = {(i, j) for i in range(self.n_row) for j in range(self.n_col)}
+
+        if self.strategy in ["backtracking", "backtracking_advanced", "backtracking_gac3"]:
+            self.constraints = []
+            self.var2constraints = {}
+
+        # I domini possono solo restringersi durante la partita: basta ripristinare {0, 1}
+        for domain in self.Domains.values():
+            domain.update((0, 1))
+        self.gac_count = 0
+
+    def set_knowledge(self, x, y, value):
+        """
+        Scrive value nella knowledge della cella (x, y) aggiornando l'impronta.
+        Tutte le modifiche alla knowledge devono passare da qui.
+        """
+        self.fingerprint = update_fingerprint(self.fingerprint, x, y, self.knowledge[x][y], value)
+        self.knowledge[x][y] = value
+
     def observe(self, x, y, value):
         """
         Aggiorna la knowledge dell'agente con l'informazione osservata.
@@ -47,7 +91,7 @@ class Agent:
             self.mine_cells.remove((x, y))
             self.safe_cells.discard((x, y))
         
-        self.knowledge[x][y] = value
+        self.set_knowledge(x, y, value)
         self.moves_made.add((x, y))
         
         # rimuovi dalle celle sconosciute
@@ -110,10 +154,20 @@ class Agent:
         remaining_mines = value - adjacent_mines
         
         if adjacent_unknown and 0 <= remaining_mines <= len(adjacent_unknown):
+            # Le stesse celle anche come bitmask (bit i * n_col + j), per i controlli di
+            # consistenza con popcount: "mask" tutte le vicine, "umask" quelle ancora sconosciute
+            mask = umask = 0
+            for nx, ny in adjacent_unknown:
+                bit = 1 << (nx * self.n_col + ny)
+                mask |= bit
+                if (nx, ny) in self.unknown_cells:
+                    umask |= bit
             self.constraints.append({
                 "cell": (x,y),
                 "neighbors": adjacent_unknown,
-                "count": remaining_mines
+                "count": remaining_mines,
+                "mask": mask,
+                "umask": umask
             })
 
 
@@ -122,7 +176,7 @@ class Agent:
         Marca una cella come mina conosciuta.
         """
         self.mine_cells.add((x, y))
-        self.knowledge[x][y] = "X"
+        self.set_knowledge(x, y, "X")
         # rimuovi dalle celle sconosciute se presente
         self.unknown_cells.discard((x, y))
         # Marca come mossa fatta e decrementa il contatore delle mine rimanenti
@@ -174,10 +228,14 @@ class Agent:
         #queue di coppie (variabile, vincolo); inseriamo tutte le possibili coppie inizialmente
         #usiamo deque per performance e semplicità
         Q = deque()
+        #coppie attualmente in coda, come (variabile, id del vincolo): una coppia viene
+        #accodata solo se non è già presente, così la coda non accumula duplicati
+        queued = set()
         for C in self.constraints:
             for v in C["neighbors"]:
                 var2cons.setdefault(v, []).append(C)
                 Q.append((v, C))
+                queued.add((v, id(C)))
 
        
         def revise(Xi, C):
@@ -204,6 +262,7 @@ class Agent:
         #finché la queue non è vuota
         while Q:
             Xi, C = Q.popleft()
+            queued.discard((Xi, id(C)))
             if revise(Xi, C):
                 if not self.Domains[Xi]: #se il dominio di X_i è ora vuoto
                     return False    #gac3 fallisce e il CSP con gli assegnamenti attuali
@@ -213,8 +272,9 @@ class Agent:
                     if Ck is C: 
                         continue
                     for Xk in Ck["neighbors"]:
-                        if Xk != Xi:
+                        if Xk != Xi and (Xk, id(Ck)) not in queued:
                             Q.append((Xk, Ck))
+                            queued.add((Xk, id(Ck)))
 
         return True
 
@@ -232,6 +292,12 @@ class Agent:
             for j in range(self.n_col):
                 if isinstance(self.knowledge[i][j], int) and self.knowledge[i][j] > 0:
                     self.add_constraint(i, j, self.knowledge[i][j])
+
+        # Indice variabile -> vincoli che la contengono (usato dalla degree heuristic)
+        self.var2constraints = {}
+        for constraint in self.constraints:
+            for var in constraint["neighbors"]:
+                self.var2constraints.setdefault(var, []).append(constraint)
         
         variables = self.get_variables()
         if not variables or (self.strategy == "backtracking" and len(variables) > 35):  # Limite per performance
@@ -250,7 +316,7 @@ class Agent:
                 if len(self.Domains[var]) == 1:
                     if next(iter(self.Domains[var])):
                         self.mine_cells.add(var)
-                        self.knowledge[var[0]][var[1]] = "X"  # Marca anche nella knowledge per visualizzazione
+                        self.set_knowledge(var[0], var[1], "X")  # Marca anche nella knowledge per visualizzazione
                     else:
                         self.safe_cells.add(var)
         else:
@@ -267,7 +333,7 @@ class Agent:
                     self.safe_cells.add(var)
                 elif can_be_mine and not can_be_safe:
                     self.mine_cells.add(var)
-                    self.knowledge[var[0]][var[1]] = "X"
+                    self.set_knowledge(var[0], var[1], "X")
 
 
     def backtrack(self, assignment, unassigned):
@@ -285,16 +351,16 @@ class Agent:
             return support.is_consistent(self, assignment)
         
         # Selezione variabile (MRV + Degree se strategia avanzata o gac3)
-        if self.strategy in ["backtracking_advanced", "backtracking_gac3"]:
-            var = support.select_unassigned_variable(self, unassigned, assignment)
+        if self.use_heuristics:
+            var = support.select_unassigned_variable(self, unassigned, assignment, use_degree=True)
         else:
             var = unassigned[0]  # Prima variabile disponibile
         
         unassigned.remove(var)
         
-        # Ordinamento valori (LCV se strategia avanzata o gac3)
-        if self.strategy in ["backtracking_advanced", "backtracking_gac3"]:
-            values = [False, True]  # Per ora ordine semplice
+        # Ordinamento valori (success prediction se strategia avanzata o gac3)
+        if self.use_heuristics:
+            values = support.order_domain_values(self, var, assignment)
         else:
             values = [False, True]
         
@@ -313,24 +379,22 @@ class Agent:
         """
         Sceglie la prossima azione in base alla strategia configurata.
         """
-        if self.strategy in ["backtracking", "backtracking_advanced", "backtracking_gac3"]:
-            #se sono state trovate celle nulle al turno precedente, si rivelano immediatamente i loro vicini
-            if self.safe_cells:
-                self.safe_cells.difference_update(self.moves_made)
-                available_safe = list(self.safe_cells)
-                self.safe_cells.clear()
-                return ("reveal_all_safe", available_safe)
-            return self._choose_action_backtracking()
-        elif self.strategy == "random":
-            return self._choose_action_random()
-        else:
+        if self._choose_action_impl is None:
             raise ValueError(f"Strategia non supportata: {self.strategy}")
+        return self._choose_action_impl()
 
 
     def _choose_action_backtracking(self):
         """
         Sceglie la prossima azione usando inferenza CSP e fallback PR.
         """
+        #se sono state trovate celle nulle al turno precedente, si rivelano immediatamente i loro vicini
+        if self.safe_cells:
+            self.safe_cells.difference_update(self.moves_made)
+            available_safe = list(self.safe_cells)
+            self.safe_cells.clear()
+            return ("reveal_all_safe", available_safe)
+        
         # Prima prova l'inferenza CSP usando metodi di istanza
         self.infer_safe_and_mines()
         
@@ -363,7 +427,8 @@ class Agent:
                     mine_cells=self.mine_cells,
                     max_vars_exact=18,      # puoi regolarlo
                     max_solutions=200000,    # idem
-                    total_mines=self.total_mines
+                    total_mines=self.total_mines,
+                    fingerprint=self.fingerprint
                 )
                 if pick is not None:
                     x, y = pick
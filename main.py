@@ -18,15 +18,13 @@ def safe_first_move(env, agent):
         tuple: (x, y, value) della cella rivelata
     """
     # Cerca in ordine: 0, 1, qualsiasi non-mina
-    for target_value in [0, 1, None]:  # None = qualsiasi non-mina
-        for i in range(env.n_row):
-            for j in range(env.n_col):
-                cell_value = env.grid[i][j]
-                if (target_value is None and cell_value != "M") or cell_value == target_value:
-                    print(f"Prima mossa sicura: cella ({i}, {j}) con valore {cell_value}")
-                    value = env.reveal(i, j)
-                    agent.observe(i, j, value)
-                    return i, j, value
+    cell = env.first_safe_cell()
+    if cell is not None:
+        i, j = cell
+        value = env.reveal(i, j)
+        print(f"Prima mossa sicura: cella ({i}, {j}) con valore {value}")
+        agent.observe(i, j, value)
+        return i, j, value
     
     # Questo non dovrebbe mai succedere in una griglia valida
     raise Exception("Impossibile trovare una prima mossa sicura!")
@@ -133,10 +131,9 @@ while True:
     # Controlla se l'agente ha vinto
     if agent.check_victory_status(env):
         # Se ha vinto, flagga automaticamente tutte le mine rimanenti
-        for i in range(n_row):
-            for j in range(n_col):
-                if env.grid[i][j] == "M" and agent.knowledge[i][j] == "?":
-                    agent.mark_mine(i, j)
+        for i, j in env.mine_cells:
+            if agent.knowledge[i][j] == "?":
+                agent.mark_mine(i, j)
         
         gui.draw_grid(agent.knowledge, agent.to_flag, 'y')
         print(f"\n HAI VINTO IN {move_count} MOSSE!")
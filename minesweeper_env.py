@@ -1,59 +1,141 @@
 import random
 
+# Valore delle mine nella griglia piatta (bytearray): i numeri vanno da 0 a 8
+MINE = 255
 
-def generate_grid(n_row, n_col, m):
+# Offset delle 8 celle adiacenti, calcolati una volta sola
+NEIGHBOR_OFFSETS = tuple((di, dj) for di in (-1, 0, 1) for dj in (-1, 0, 1)
+                         if not (di == 0 and dj == 0))
+
+
+def generate_grid(n_row, n_col, m, rng=None):
     """
     Genera una griglia n_row x n_col per il minesweeper con m mine posizionate casualmente.
     
     Args:
         n_row, n_col (int): Dimensioni della griglia (n_row x n_col)
         m (int): Numero di mine da posizionare
+        rng (random.Random, opzionale): generatore da usare; se None si usa il modulo random globale
     
     Returns:
         list: Matrice n x n con mine ("M") e numeri che indicano le mine adiacenti
     """
+    return generate_grid_with_mines(n_row, n_col, m, rng=rng)[0]
+
+
+def generate_grid_with_mines(n_row, n_col, m, rng=None):
+    """
+    Come generate_grid, ma restituisce anche le posizioni delle mine, già note durante
+    la generazione (così non serve riscandire la griglia per ritrovarle).
+    
+    Returns:
+        tuple: (griglia, lista delle coordinate (i, j) delle mine)
+    """
+    cells, mine_positions = generate_cells(n_row, n_col, m, rng=rng)
+    return grid_from_cells(cells, n_row, n_col, mine_positions), mine_positions
+
+
+def generate_cells(n_row, n_col, m, rng=None):
+    """
+    Genera la griglia in forma piatta: un bytearray di n_row * n_col byte, in cui la cella (i, j)
+    è in posizione i * n_col + j e vale il numero di mine adiacenti (0-8) oppure MINE.
+    Un solo blocco contiguo invece di una lista di liste di oggetti Python.
+    
+    Returns:
+        tuple: (bytearray delle celle, lista delle coordinate (i, j) delle mine)
+    """
     # Verifica che il numero di mine non superi il numero di celle disponibili
     if m > n_row * n_col:
         raise ValueError("Il numero di mine non può superare il numero di celle disponibili")
     
     # Inizializza la griglia con zeri
-    grid = [[0 for _ in range(n_col)] for _ in range(n_row)]
+    cells = bytearray(n_row * n_col)
     
-    # Genera posizioni casuali per le mine
-    positions = [(i, j) for i in range(n_row) for j in range(n_col)]
+    # Genera posizioni casuali per le mine: si campionano indici piatti da un range
+    # (senza costruire la lista di tutte le n_row*n_col tuple) e si riconvertono in (i, j)
     #random.seed(41) #NOTA: random.seed() ha scope GLOBALE per il modulo random.
     #random.Random(41) # questo ha scope locale, solo per la generazione della griglia.
-    mine_positions = random.sample(positions, m)
+    rng = rng or random
+    mine_positions = [divmod(k, n_col) for k in rng.sample(range(n_row * n_col), m)]
     
     # Posiziona le mine
     for row, col in mine_positions:
-        grid[row][col] = "M"
+        cells[row * n_col + col] = MINE
 
     # Calcola i numeri per le celle intorno alle mine
+    # (si scorrono solo le mine: O(m) invece di O(n_row * n_col))
     for i,j in mine_positions:
         # Controlla tutte le 8 direzioni adiacenti
-        for di in [-1, 0, 1]:
-            for dj in [-1, 0, 1]:
-                # Salta la cella centrale
-                if di == 0 and dj == 0:
-                    continue
-                        
-                ni, nj = i + di, j + dj
-                # Verifica che la posizione sia valida
-                if 0 <= ni < n_row and 0 <= nj < n_col:
-                    if isinstance(grid[ni][nj], int):
-                        grid[ni][nj] += 1
+        for di, dj in NEIGHBOR_OFFSETS:
+            ni, nj = i + di, j + dj
+            # Verifica che la posizione sia valida
+            if 0 <= ni < n_row and 0 <= nj < n_col:
+                k = ni * n_col + nj
+                if cells[k] != MINE:
+                    cells[k] += 1
    
+    return cells, mine_positions
+
+
+def grid_from_cells(cells, n_row, n_col, mine_positions):
+    """
+    Ricostruisce la griglia come lista di liste (numeri e "M") dal bytearray piatto:
+    ogni riga è copiata in C con list(), poi si rimettono le "M" sulle sole mine.
+    """
+    grid = [list(cells[i * n_col:(i + 1) * n_col]) for i in range(n_row)]
+    for i, j in mine_positions:
+        grid[i][j] = "M"
     return grid
 
 
 
 class MinesweeperEnv:
-    def __init__(self, n_row, n_col, m):
+    def __init__(self, n_row, n_col, m, rng=None):
         self.n_row = n_row
         self.n_col = n_col
         self.m = m
-        self.grid = generate_grid(n_row, n_col, m)
+        # Generatore passato dal chiamante (es. uno solo per tutto un assessment), None = random globale
+        self.rng = rng
+        self.reset()
+
+
+    def reset(self):
+        """
+        Genera una nuova griglia con le stesse dimensioni e lo stesso numero di mine,
+        così la stessa istanza può essere riusata per più partite.
+        """
+        # Griglia piatta (bytearray, usata per le ricerche veloci) e lista di liste (grid[i][j],
+        # l'interfaccia usata da agente, GUI e script), costruita dalla prima
+        self.cells, mines = generate_cells(self.n_row, self.n_col, self.m, rng=self.rng)
+        self.grid = grid_from_cells(self.cells, self.n_row, self.n_col, mines)
+        # Le mine non si spostano durante la partita: posizioni (in ordine di scansione) e
+        # insieme si calcolano una volta sola per griglia
+        self.mine_positions = tuple(sorted(mines))
+        self.mine_cells = set(mines)
+
+
+    def first_safe_cell(self):
+        """
+        Restituisce la cella per la prima mossa sicura, cercando in ordine:
+        la prima cella con 0, poi la prima con 1, poi la prima non-mina (riga per riga).
+        Le ricerche sono fatte in C sulla griglia piatta (bytearray.find) e si fermano alla
+        prima occorrenza: se c'è uno 0 (il caso normale) basta una sola passata, che termina
+        appena lo trova. Le ricerche successive servono solo se la griglia non ha zeri.
+        
+        Returns:
+            tuple | None: (i, j) della cella, None se la griglia non ha celle sicure
+        """
+        cells = self.cells
+        for target in (0, 1):
+            k = cells.find(target)
+            if k >= 0:
+                return divmod(k, self.n_col)
+        # Né 0 né 1: la prima non-mina segue le sole mine iniziali, quindi si scorre solo quel
+        # prefisso (senza copiare la griglia)
+        for k, value in enumerate(cells):
+            if value != MINE:
+                return divmod(k, self.n_col)
+        return None
 
 
     def reveal(self, x, y):
@@ -88,16 +170,18 @@ class MinesweeperEnv:
             bool: True se l'agente ha vinto, False altrimenti
         """
         
-        # Conta quante celle non-mine sono state rivelate dall'agente
-        revealed_non_mine_cells = 0
-        for i in range(self.n_row):
-            for j in range(self.n_col):
-                if (self.grid[i][j] != "M" and 
-                    agent_knowledge[i][j] != "?" and 
-                    agent_knowledge[i][j] != "X"):
-                    revealed_non_mine_cells += 1
+        # Conta quante celle non-mine sono state rivelate dall'agente: tutte le celle rivelate
+        # (contate riga per riga in C con list.count) meno le mine rivelate, cercate solo tra
+        # le posizioni note delle mine invece di confrontare ogni cella con la griglia reale
+        revealed_cells = 0
+        for row in agent_knowledge:
+            revealed_cells += len(row) - row.count("?") - row.count("X")
+        revealed_mines = 0
+        for i, j in self.mine_positions:
+            if agent_knowledge[i][j] != "?" and agent_knowledge[i][j] != "X":
+                revealed_mines += 1
         
-        return revealed_non_mine_cells == total_non_mine_cells
+        return revealed_cells - revealed_mines == total_non_mine_cells
 
 
     def print_grid(self): # per debugging
@@ -11,8 +11,116 @@
 # cioè (# soluzioni in cui è mina) / (# soluzioni totali compatibili).
 
 from collections import defaultdict, deque
+from functools import lru_cache
 import math
 
+# Memo dei risultati di run(), indicizzato sulla firma (variabili, vincoli, max_solutions),
+# in coordinate relative alla componente: forme uguali in punti diversi della griglia condividono la voce.
+# Le stesse componenti si ripresentano spesso tra un turno e l'altro (e tra i test):
+# in quel caso l'enumerazione, esponenziale, non viene rifatta.
+_RUN_CACHE = {}
+_RUN_CACHE_MAX = 1024  # oltre questa soglia si scarta la voce più vecchia (FIFO)
+
+def clear_cache():
+    """Svuota il memo dei risultati di ExactEnumeration.run (utile nei test)."""
+    _RUN_CACHE.clear()
+
+@lru_cache(maxsize=8)
+def _bitsliced_columns(k):
+    """
+    Colonne "bit-sliced" delle 2^k assegnazioni di k variabili: la colonna j è un intero di 2^k bit
+    in cui il bit a vale 1 se nell'assegnazione numero a la variabile j è mina ((a >> j) & 1).
+    Memoizzato per k: le stesse colonne servono a tutte le componenti con k variabili.
+    Restituisce (colonne, maschera con tutti i 2^k bit a 1).
+    """
+    n = 1 << k
+    cols = []
+    for j in range(k):
+        half = 1 << j
+        col = ((1 << half) - 1) << half  # Periodo 2^(j+1): 2^j zeri seguiti da 2^j uni
+        length = 2 * half
+        while length < n:  # Raddoppio il motivo fino a coprire tutte le 2^k assegnazioni
+            col |= col << length
+            length *= 2
+        cols.append(col)
+    return tuple(cols), (1 << n) - 1
+
+def _bitsliced_kernel(cons_bits, counts, k):
+    """
+    Valuta tutte le 2^k assegnazioni insieme (bit-slicing): ogni assegnazione è una posizione di bit
+    negli interi-colonna di _bitsliced_columns, e gli operatori bit a bit di Python agiscono su tutte
+    le posizioni in una volta, in C.
+    Per ogni vincolo si somma (con un sommatore a propagazione di riporto sui "piani" di bit) le colonne
+    delle sue variabili, e si tengono le posizioni in cui la somma vale esattamente count.
+    - cons_bits: per ogni vincolo, gli indici (bit) delle sue variabili nella componente
+    - counts: mine richieste da ogni vincolo
+    Restituisce (solutions, bit_counts), come _enumerate_kernel senza troncamento.
+    """
+    cols, full = _bitsliced_columns(k)
+    valid = full  # Posizioni (assegnazioni) che soddisfano tutti i vincoli visti finora
+    for bits, req in zip(cons_bits, counts):
+        planes = []  # planes[p] = bit p della somma, per ogni assegnazione
+        for b in bits:
+            carry = cols[b]
+            for p in range(len(planes)):
+                plane = planes[p]
+                planes[p] = plane ^ carry
+                carry &= plane
+                if not carry:
+                    break
+            if carry:
+                planes.append(carry)
+        if req >> len(planes):
+            return 0, [0] * k  # count maggiore di quanto la somma possa valere: nessuna soluzione
+        for p, plane in enumerate(planes):
+            valid &= plane if req >> p & 1 else full ^ plane
+        if not valid:
+            return 0, [0] * k
+    return valid.bit_count(), [(valid & col).bit_count() for col in cols]
+
+def _enumerate_kernel(bit_cons, counts, k, limit):
+    """
+    Nucleo numerico dell'enumerazione esaustiva in codice di Gray (vedi _search_bitmask).
+    Due assegnazioni consecutive differiscono per un solo bit, quindi si aggiornano solo le somme
+    dei vincoli che contengono quel bit; un contatore dei vincoli non soddisfatti dice in O(1)
+    se l'assegnazione corrente è una soluzione.
+    Lavora solo su interi e liste di interi, senza accedere all'istanza:
+    - bit_cons: per ogni bit, gli indici dei vincoli che lo contengono
+    - counts: mine richieste da ogni vincolo
+    - k: numero di bit (variabili)
+    - limit: numero massimo di soluzioni da contare
+    Restituisce (solutions, bit_counts), dove bit_counts[b] è il numero di soluzioni in cui il bit b vale 1.
+    """
+    sums = [0] * len(counts)  # Mine correnti in ogni vincolo (assegnazione iniziale: tutte safe)
+    unsat = sum(1 for req in counts if req != 0)  # Vincoli non soddisfatti dall'assegnazione corrente
+    bit_counts = [0] * k  # Per ogni bit, in quante soluzioni vale 1
+    solutions = 0
+    g = 0  # Assegnazione corrente (codice di Gray)
+    for i in range(1 << k):
+        if i:
+            b = (i & -i).bit_length() - 1  # Al passo i cambia il bit meno significativo a 1 di i
+            g ^= 1 << b
+            delta = 1 if g >> b & 1 else -1
+            for ci in bit_cons[b]:
+                req = counts[ci]
+                s = sums[ci]
+                if s == req:
+                    unsat += 1  # Il vincolo era soddisfatto e ora non lo è più
+                s += delta
+                sums[ci] = s
+                if s == req:
+                    unsat -= 1  # Il vincolo ora è soddisfatto
+        if unsat == 0:
+            solutions += 1  # Soluzione valida trovata
+            t = g
+            while t:  # Scorro solo i bit a 1 (le mine) della soluzione
+                low = t & -t
+                bit_counts[low.bit_length() - 1] += 1
+                t ^= low
+            if solutions >= limit:
+                break  # Troppe soluzioni: mi fermo
+    return solutions, bit_counts
+
 class ExactEnumeration:
     def __init__(self, variables, constraints, max_solutions=200000):
         """
@@ -24,8 +132,10 @@ class ExactEnumeration:
         """
         # Ordino le variabili per avere sempre lo stesso ordine (utile per debug e test)
         self.vars = list(sorted(variables))
-        # Faccio una copia dei vincoli per evitare effetti collaterali
-        self.cons = [{"vars": set(c["vars"]), "count": int(c["count"])} for c in constraints]
+        # Faccio una copia dei vincoli per evitare effetti collaterali; le variabili di ogni
+        # vincolo diventano un frozenset, costruito una volta sola (e riusato così com'è se
+        # il vincolo arriva già congelato, es. dalla cache di frontier_components)
+        self.cons = [{"vars": frozenset(c["vars"]), "count": int(c["count"])} for c in constraints]
         self.max_solutions = max_solutions
 
         # Inizializzo i contatori che mi servono per calcolare le marginali
@@ -51,196 +161,143 @@ class ExactEnumeration:
                 # aggiungo l'indice del vincolo ci alla lista delle occorrenze della variabile v
                 self.var_to_cons[v].append(ci)
 
-    def _feasible(self, assign, cons_state):
+    def _search(self):
         """
-        Controllo veloce di fattibilità: per ogni vincolo deve valere t <= req <= t+u,
-        dove:
+        Ricerca con backtracking e forward checking per componenti grandi, in forma iterativa
+        (senza ricorsione: niente frame Python per ogni nodo né copie dello stato).
+        Per ogni vincolo si tiene lo stato corrente:
           - t = mine già assegnate
           - u = variabili ancora ignote
-          - req = mine richieste dal vincolo
-        Se anche solo un vincolo non è soddisfatto, posso scartare subito la configurazione.
+          - req = mine richieste
+        Un vincolo resta soddisfacibile finché t <= req <= t + u. Dopo ogni assegnazione si
+        ricontrollano solo i vincoli toccati e si propagano i valori forzati (req == t: ignote
+        tutte safe; req == t + u: ignote tutte mine). Ogni assegnazione finisce su una pila
+        (trail), così il backtracking annulla esattamente quanto fatto dopo un certo punto.
+        Le variabili vengono scelte in ordine di grado decrescente (numero di vincoli in cui
+        compaiono), come prima variabile ancora ignota in quell'ordine.
         """
-        for (t, u, req) in cons_state:
-            if not (t <= req <= t + u): # Se il vincolo non può essere soddisfatto
-                return False
-        return True
+        k = len(self.vars)
+        idx = {v: i for i, v in enumerate(self.vars)}  # Variabile -> indice intero
+        cons_vars = [[idx[v] for v in c if v in idx] for c in self.cons_vars]  # Indici delle variabili di ogni vincolo
+        var_cons = [self.var_to_cons[v] for v in self.vars]  # Indici dei vincoli di ogni variabile
+        req = [c["count"] for c in self.cons]
+        t = [0] * len(self.cons)
+        u = [len(cv) for cv in cons_vars]
+        value = [-1] * k  # -1 = non assegnata, 0 = safe, 1 = mina
+        trail = []  # Variabili assegnate, in ordine di assegnazione
+        order = sorted(range(k), key=lambda x: -len(var_cons[x]))  # Ordine di scelta (grado decrescente)
 
-    def _init_cons_state(self, assign):
-        """
-        Inizializzo lo stato dei vincoli.
-        Per ogni vincolo tengo traccia di:
-        - t: quante mine già assegnate
-        - u: quante variabili ancora ignote
-        - req: mine richieste dal vincolo
-        Lo stato viene aggiornato dinamicamente durante la ricerca.
-        """
-        state = []  # Lista dello stato dei vincoli
-        for c in self.cons:  # Scorro tutti i vincoli
-            t = 0  # Mine già assegnate
-            u = 0  # Variabili ancora ignote
-            for v in c["vars"]:  # Scorro tutte le variabili del vincolo
-                av = assign.get(v, None)  # Valore assegnato alla variabile (se presente)
-                if av is None:
-                    u += 1  # Variabile ancora ignota
-                elif av == 1:
-                    t += 1  # Variabile assegnata a mina
-            state.append([t, u, c["count"]])  # Stato del vincolo: [mine assegnate, ignote, richieste]
-        return state  # Ritorno lo stato di tutti i vincoli
-    
-    def _propagate(self, assign, cons_state):
-        """
-        Propagazione dei vincoli (forward-checking).
-        Se in un vincolo il numero di mine richieste è già stato raggiunto (req == t),
-        allora tutte le variabili ancora ignote devono essere safe (0).
-        Se invece il numero di mine richieste è pari al numero di ignote più le mine già assegnate (req == t + u),
-        allora tutte le ignote devono essere mine (1).
-        Se trova una contraddizione (ad esempio, troppe mine già assegnate), ritorna False.
-        Viene ripetuta finché trova nuove assegnazioni forzate.
-        """
-        changed = True  # Flag per sapere se ci sono state modifiche
-        while changed:  # Ripeto finché trovo nuove assegnazioni forzate
-            changed = False
-            for ci, c in enumerate(self.cons):  # Scorro tutti i vincoli
-                t, u, req = cons_state[ci]  # Estraggo lo stato del vincolo
-                if u == 0:
-                    # Tutte le variabili del vincolo sono già assegnate: controllo che il conteggio torni
-                    if t != req:
-                        return False  # Contraddizione: tutte assegnate ma il conteggio non torna
-                    continue  # Passo al prossimo vincolo
-                if req < t or req > t + u:
-                    return False  # Contraddizione: impossibile soddisfare il vincolo
-                if req == t:
-                    # Tutte le ignote devono essere safe (0)
-                    for v in c["vars"]:
-                        if assign.get(v, None) is None:  # Se la variabile non è ancora assegnata
-                            assign[v] = 0  # Assegno 0 (safe)
-                            cons_state[ci][1] -= 1  # Una ignota in meno in questo vincolo
-                            # Aggiorna anche gli altri vincoli che contengono v
-                            for cj in self.var_to_cons[v]:
-                                if cj == ci:
-                                    continue  # Salto il vincolo corrente
-                                cons_state[cj][1] -= 1  # Una ignota in meno anche negli altri vincoli
-                    changed = True  # Ho fatto una modifica, quindi ripeto il ciclo
-                elif req == t + u:
-                    # Tutte le ignote devono essere mine (1)
-                    for v in c["vars"]:
-                        if assign.get(v, None) is None:  # Se la variabile non è ancora assegnata
-                            assign[v] = 1  # Assegno 1 (mina)
-                            cons_state[ci][0] += 1  # Una mina in più in questo vincolo
-                            cons_state[ci][1] -= 1  # Una ignota in meno in questo vincolo
-                            for cj in self.var_to_cons[v]:
-                                if cj == ci:
-                                    continue  # Salto il vincolo corrente
-                                cons_state[cj][0] += 1  # Una mina in più anche negli altri vincoli
-                                cons_state[cj][1] -= 1  # Una ignota in meno anche negli altri vincoli
-                    changed = True  # Ho fatto una modifica, quindi ripeto il ciclo
-        return True  # Propagazione completata senza contraddizioni
+        def assign(x, val):
+            value[x] = val
+            trail.append(x)
+            for ci in var_cons[x]:
+                u[ci] -= 1
+                t[ci] += val
 
-    def _select_var(self, assign):
-        """
-        Sceglie la prossima variabile da assegnare.
-        L'euristica è quella di scegliere la variabile non ancora assegnata che compare
-        nel maggior numero di vincoli (grado massimo). Questo aiuta a ridurre più rapidamente
-        lo spazio delle soluzioni possibili, perché si va a lavorare sulle variabili più "vincolate".
-        """
-        best_v = None  # Migliore variabile trovata finora
-        best_deg = -1  # Grado massimo trovato finora
-        for v, cons_list in self.var_to_cons.items():  # Scorro tutte le variabili
-            if v in assign:
-                continue  # Salto quelle già assegnate
-            deg = len(cons_list)  # Numero di vincoli in cui compare
-            if deg > best_deg:
-                best_deg = deg  # Aggiorno il grado massimo
-                best_v = v  # Aggiorno la variabile migliore
-        return best_v  # Ritorno la variabile scelta
-
-    def _search(self, assign, cons_state):
-        """
-        Ricerca ricorsiva con backtracking e propagazione dei vincoli.
-        Se tutte le variabili sono assegnate, verifica che tutti i vincoli siano soddisfatti.
-        Altrimenti, seleziona una variabile, prova entrambi i valori (0 e 1),
-        aggiorna lo stato dei vincoli e ricorre.
-        Se un vincolo non può più essere soddisfatto, interrompe il ramo (pruning).
-        """
-        if self.solution_count >= self.max_solutions:
-            # Se ho già trovato troppe soluzioni, mi fermo per evitare esplosioni di tempo/memoria
-            return
+        def undo_to(mark):
+            # Annulla tutte le assegnazioni fatte dopo la posizione mark del trail
+            while len(trail) > mark:
+                x = trail.pop()
+                for ci in var_cons[x]:
+                    u[ci] += 1
+                    t[ci] -= value[x]
+                value[x] = -1
 
-        # Caso base: tutte assegnate → verifica finale dei vincoli
-        if len(assign) == len(self.vars):
-            for (t, u, req) in cons_state:  # Scorro tutti i vincoli
-                if not (u == 0 and t == req):  # Se anche solo un vincolo non è soddisfatto
-                    return  # Scarto la soluzione
-            self.solution_count += 1  # Soluzione valida trovata
-            for v, val in assign.items():  # Scorro tutte le variabili assegnate
-                if val == 1:
-                    self.true_counts[v] += 1  # Incremento il contatore se la variabile è mina
-            return
+        def propagate(dirty):
+            # Forward checking + propagazione sui vincoli in dirty (e su quelli toccati via via)
+            stack = list(dirty)
+            while stack:
+                ci = stack.pop()
+                tt, uu, r = t[ci], u[ci], req[ci]
+                if r < tt or r > tt + uu:
+                    return False  # Contraddizione: vincolo non più soddisfacibile
+                if uu and (r == tt or r == tt + uu):
+                    val = 0 if r == tt else 1  # Ignote tutte safe oppure tutte mine
+                    for x in cons_vars[ci]:
+                        if value[x] < 0:
+                            assign(x, val)
+                            stack.extend(var_cons[x])
+            return True
 
-        # Propagazione dei vincoli prima di scegliere la prossima variabile
-        if not self._propagate(assign, cons_state):
-            # Se la propagazione trova una contraddizione, scarto subito il ramo
-            return
+        def select():
+            for x in order:
+                if value[x] < 0:
+                    return x
+            return None
 
-        # Scegli la prossima variabile da assegnare
-        v = self._select_var(assign)
-        if v is None:
+        bit_counts = [0] * k  # Per ogni variabile, in quante soluzioni è mina
+        solutions = 0
+        if self.solution_count >= self.max_solutions or not propagate(range(len(self.cons))):
             return
-
-        # Prova entrambi i valori (0 = safe, 1 = mina)
-        for val in (0, 1):
-            assign[v] = val  # Assegno il valore alla variabile
-            saved = [c.copy() for c in cons_state]  # Salva lo stato per backtracking
-            for ci in self.var_to_cons[v]:  # Aggiorna lo stato dei vincoli che coinvolgono v
-                if val == 1:
-                    cons_state[ci][0] += 1  # Una mina in più
-                cons_state[ci][1] -= 1  # Una ignota in meno
-            ok = True  # Flag per verificare se i vincoli sono ancora soddisfatti
-            for (t, u, req) in cons_state:
-                if not (t <= req <= t + u):
-                    ok = False  # Vincolo non più soddisfatto
+        frames = []  # Pila dei punti di scelta: [variabile, posizione del trail, prossimo valore]
+        descend = True
+        while True:
+            if descend:
+                x = select()
+                if x is None:
+                    # Tutte assegnate e tutti i vincoli con u == 0 e t == req: soluzione valida
+                    solutions += 1
+                    for y in range(k):
+                        if value[y] == 1:
+                            bit_counts[y] += 1
+                    if self.solution_count + solutions >= self.max_solutions:
+                        break  # Troppe soluzioni: mi fermo
+                else:
+                    frames.append([x, len(trail), 0])
+            descend = False
+            # Prova il prossimo valore del punto di scelta più recente (0 = safe, poi 1 = mina)
+            while frames:
+                frame = frames[-1]
+                x, mark, val = frame
+                undo_to(mark)
+                if val > 1:
+                    frames.pop()  # Entrambi i valori provati: backtracking
+                    continue
+                frame[2] = val + 1
+                assign(x, val)
+                if propagate(var_cons[x]):
+                    descend = True
                     break
-            if ok:
-                self._search(assign, cons_state)  # Ricorsione
-            assign.pop(v, None)  # Backtracking: rimuovo l'assegnazione
-            cons_state = saved  # Ripristina lo stato
+            if not descend:
+                break  # Nessun punto di scelta rimasto: ricerca completata
 
-    # ------- fallback semplice per componenti molto piccole -------
-    def _check_constraints(self, assign):
-        """
-        Controlla che una assegnazione soddisfi tutti i vincoli.
-        Questa funzione viene usata nella versione semplice (brute-force) per componenti piccole.
-        Scorre tutti i vincoli e verifica che il numero di mine assegnate sia esattamente quello richiesto.
-        """
-        for c in self.cons:  # Scorro tutti i vincoli
-            s = 0  # Contatore delle mine assegnate
-            for v in c["vars"]:  # Scorro tutte le variabili del vincolo
-                s += 1 if assign.get(v, 0) == 1 else 0  # Incremento se la variabile è mina
-            if s != c["count"]:  # Se il conteggio non torna
-                return False  # Vincolo non soddisfatto
-        return True  # Tutti i vincoli soddisfatti
+        self.solution_count += solutions
+        for v, i in idx.items():
+            self.true_counts[v] += bit_counts[i]
 
-    def _search_simple(self, idx, order, assign):
+    # ------- enumerazione esaustiva per componenti piccole -------
+    def _search_bitmask(self):
         """
-        Enumerazione esaustiva semplice (senza propagazione) per componenti piccole.
-        Prova tutte le possibili assegnazioni delle variabili, una per una.
-        Quando arriva in fondo, controlla se la soluzione è valida e aggiorna i contatori.
+        Enumerazione esaustiva (senza propagazione) per componenti piccole, su bitmask.
+        Qui si preparano solo gli indici delle variabili e dei vincoli; il conteggio vero
+        e proprio lo fa _bitsliced_kernel, che valuta tutte le 2^k assegnazioni in blocco
+        (bit-slicing: un intero per variabile, un bit per assegnazione) e ne ricava in un
+        colpo il numero di soluzioni e quante volte ogni variabile è mina.
+        Solo se le soluzioni superano max_solutions si ripiega su _enumerate_kernel, che
+        visita le assegnazioni una alla volta in ordine di codice di Gray (aggiornando le
+        somme dei soli vincoli toccati dal bit cambiato) e può fermarsi al limite.
         """
-        if idx == len(order):  # Se ho assegnato tutte le variabili
-            if self._check_constraints(assign):  # Controllo se la soluzione è valida
-                self.solution_count += 1  # Soluzione valida trovata
-                for v, val in assign.items():  # Scorro tutte le variabili assegnate
-                    if val == 1:
-                        self.true_counts[v] += 1  # Incremento il contatore se la variabile è mina
-            return
         if self.solution_count >= self.max_solutions:
             return
-        v = order[idx]  # Prendo la prossima variabile da assegnare
-        assign[v] = 0  # Prova valore 0 (safe)
-        self._search_simple(idx + 1, order, assign)  # Ricorsione
-        assign[v] = 1  # Prova valore 1 (mina)
-        self._search_simple(idx + 1, order, assign)  # Ricorsione
-        assign.pop(v, None)  # Backtracking: rimuovo l'assegnazione
+        k = len(self.vars)
+        bit_of = {v: idx for idx, v in enumerate(self.vars)}  # Bit associato a ogni variabile
+        bit_cons = [[] for _ in range(k)]  # Per ogni bit, gli indici dei vincoli che lo contengono
+        for ci, c in enumerate(self.cons):
+            for v in c["vars"]:
+                if v in bit_of:  # Variabili fuori dalla componente contano come safe
+                    bit_cons[bit_of[v]].append(ci)
+        counts = [c["count"] for c in self.cons]  # Mine richieste da ogni vincolo
+        limit = self.max_solutions - self.solution_count
+        # Valutazione di tutte le assegnazioni in blocco (bit-slicing); se le soluzioni superano
+        # il limite si ripete l'enumerazione in codice di Gray, che si ferma al limite
+        cons_bits = [[bit_of[v] for v in c["vars"] if v in bit_of] for c in self.cons]
+        solutions, bit_counts = _bitsliced_kernel(cons_bits, counts, k)
+        if solutions > limit:
+            solutions, bit_counts = _enumerate_kernel(bit_cons, counts, k, limit)
+
+        self.solution_count += solutions
+        for v, b in bit_of.items():
+            self.true_counts[v] += bit_counts[b]
 
     def marginals(self):
         """
@@ -253,25 +310,154 @@ class ExactEnumeration:
             return {}  # Nessuna soluzione compatibile trovata
         return res["marginals"]  # Ritorno le marginali
 
+    def _signature(self):
+        """
+        Firma canonica della componente, usata come chiave del memo:
+        l'insieme delle variabili, l'insieme dei vincoli (come coppie (frozenset, count))
+        e max_solutions, che può troncare l'enumerazione.
+        Le coordinate sono traslate in modo che la cella minima della componente sia (0, 0):
+        la stessa forma di frontiera in un altro punto della griglia ha la stessa firma
+        e riusa il risultato già calcolato.
+        Restituisce (firma, (di, dj)), dove (di, dj) è la traslazione da riapplicare.
+        """
+        di = min(i for i, _ in self.vars) if self.vars else 0
+        dj = min(j for _, j in self.vars) if self.vars else 0
+        cons = frozenset((frozenset((i - di, j - dj) for i, j in c["vars"]), c["count"]) for c in self.cons)
+        return (frozenset((i - di, j - dj) for i, j in self.vars), cons, self.max_solutions), (di, dj)
+
+    def _unit_propagate(self):
+        """
+        Preprocessing dei vincoli prima dell'enumerazione (propagazione unitaria):
+        - se un vincolo ha count == 0, tutte le sue variabili sono safe (0);
+        - se un vincolo ha count == numero di variabili, sono tutte mine (1).
+        Le variabili fissate vengono tolte dagli altri vincoli (scalando il count delle mine),
+        e si ripete fino a punto fisso. Ogni variabile fissata dimezza lo spazio da enumerare.
+        Restituisce (fixed, residual), dove fixed è il dict {variabile: 0/1} delle variabili
+        forzate e residual la lista dei vincoli rimasti sulle sole variabili libere,
+        oppure None se i vincoli sono contraddittori.
+        """
+        cons = [[set(c["vars"]), c["count"]] for c in self.cons]  # Copie modificabili [variabili, count]
+        fixed = {}
+        changed = True
+        while changed:  # Ripeto finché trovo nuove variabili forzate
+            changed = False
+            for c in cons:
+                vars_, count = c
+                for v in [v for v in vars_ if v in fixed]:  # Tolgo le variabili già fissate
+                    vars_.discard(v)
+                    count -= fixed[v]
+                c[1] = count
+                if count < 0 or count > len(vars_):
+                    return None  # Contraddizione: il vincolo non può essere soddisfatto
+                if vars_ and (count == 0 or count == len(vars_)):
+                    val = 0 if count == 0 else 1  # Tutte safe o tutte mine
+                    for v in vars_:
+                        fixed[v] = val
+                    vars_.clear()
+                    c[1] = 0
+                    changed = True
+        residual = [{"vars": frozenset(vars_), "count": count} for vars_, count in cons if vars_]
+        return fixed, residual
+
+    def _enumerate(self):
+        """
+        Enumera le soluzioni compatibili aggiornando solution_count e true_counts.
+        Prima fissa le variabili forzate con la propagazione unitaria, poi enumera
+        solo le variabili rimaste libere sui vincoli residui.
+        """
+        pre = self._unit_propagate()
+        if pre is None:
+            return  # Vincoli contraddittori: nessuna soluzione
+        fixed, residual = pre
+        if not fixed:
+            self._solve()  # Nessuna variabile forzata: enumero direttamente
+            return
+        free = [v for v in self.vars if v not in fixed]
+        sub = ExactEnumeration(free, residual, max_solutions=self.max_solutions)
+        sub._solve()
+        self.solution_count = sub.solution_count
+        for v in self.vars:
+            if v in fixed:
+                # Variabile forzata: mina in tutte le soluzioni oppure in nessuna
+                self.true_counts[v] = sub.solution_count if fixed[v] else 0
+            else:
+                self.true_counts[v] = sub.true_counts[v]
+
+    def _solve_disjoint(self):
+        """
+        Caso in forma chiusa: vincoli a due a due disgiunti (ad esempio un solo vincolo).
+        Un vincolo su n variabili con count c ammette comb(n, c) assegnazioni, e ogni sua
+        variabile è mina in comb(n - 1, c - 1) di esse; vincoli disgiunti sono indipendenti
+        e le variabili fuori da ogni vincolo valgono 0 o 1 liberamente, quindi il numero di
+        soluzioni è il prodotto dei fattori e non serve enumerare 2^k assegnazioni.
+        Si usa solo se le soluzioni non superano max_solutions (altrimenti l'enumerazione
+        le troncherebbe): restituisce True se ha calcolato i contatori, False altrimenti.
+        """
+        seen = set()
+        for c in self.cons:
+            if not seen.isdisjoint(c["vars"]):
+                return False  # Due vincoli condividono variabili: serve l'enumerazione
+            seen.update(c["vars"])
+        var_set = set(self.vars)
+        n_free = len(var_set - seen)  # Variabili non toccate da alcun vincolo
+        total = 1 << n_free
+        for c in self.cons:
+            n = len(c["vars"] & var_set)
+            total *= math.comb(n, c["count"]) if 0 <= c["count"] <= n else 0
+        if total == 0:
+            return True  # Qualche vincolo è insoddisfacibile: nessuna soluzione
+        if self.solution_count + total > self.max_solutions:
+            return False
+        self.solution_count += total
+        for c in self.cons:
+            n = len(c["vars"] & var_set)
+            if n == 0:
+                continue  # Vincolo senza variabili della componente (count 0): nessun contributo
+            per_var = total * c["count"] // n  # = comb(n - 1, c - 1) * (soluzioni degli altri fattori)
+            for v in c["vars"]:
+                if v in var_set:
+                    self.true_counts[v] += per_var
+        for v in var_set - seen:
+            self.true_counts[v] += total // 2  # Variabile libera: mina in metà delle soluzioni
+        return True
+
+    def _solve(self):
+        """
+        Enumera le soluzioni sulle variabili e sui vincoli di questa istanza.
+        Sceglie la strategia in base alla dimensione della componente.
+        """
+        if self._solve_disjoint():
+            return  # Vincoli indipendenti: conteggio in forma chiusa, niente enumerazione
+        if len(self.vars) <= 20:  # Se la componente è piccola, uso la brute-force su bitmask
+            self._search_bitmask()  # Avvio l'enumerazione esaustiva
+        else:
+            self._search()  # Avvio la ricerca con propagazione
+
     def run(self):
         """
         Esegue l'enumerazione delle soluzioni compatibili.
         Sceglie la strategia in base alla dimensione della componente:
-        - Per <=20 variabili: enumerazione esaustiva semplice (robusta)
+        Prima dell'enumerazione, la propagazione unitaria fissa le variabili forzate;
+        poi, in base al numero di variabili rimaste libere:
+        - Per <=20 variabili: enumerazione esaustiva su bitmask (robusta)
         - Per >20 variabili: backtracking con propagazione e pruning
+        Il risultato è memoizzato: una componente con la stessa firma non viene rienumerata.
         Restituisce:
             - "solutions": numero di soluzioni compatibili trovate
             - "marginals": dict {(i,j): p} con la probabilità marginale di mina per ogni cella
         """
-        assign = {}  # Dizionario delle assegnazioni correnti
-        if len(self.vars) <= 20:  # Se la componente è piccola, uso la brute-force semplice
-            order = list(self.vars)  # Ordine delle variabili
-            self._search_simple(0, order, assign)  # Avvio la ricerca semplice
+        key, (di, dj) = self._signature()
+        cached = _RUN_CACHE.get(key)
+        if cached is not None:
+            # Componente (o stessa forma traslata) già enumerata: ripristino i contatori dal memo
+            self.solution_count, true_counts = cached
+            self.true_counts = {(i + di, j + dj): n for (i, j), n in true_counts.items()}
         else:
-            cons_state = self._init_cons_state(assign)  # Stato iniziale dei vincoli
-            if not self._feasible(assign, cons_state):  # Se già all'inizio i vincoli sono impossibili
-                return None  # Esco subito
-            self._search(assign, cons_state)  # Avvio la ricerca con propagazione
+            self._enumerate()
+            if len(_RUN_CACHE) >= _RUN_CACHE_MAX:
+                del _RUN_CACHE[next(iter(_RUN_CACHE))]  # Scarto la voce inserita per prima
+            # Nel memo i contatori sono in coordinate traslate, come la firma
+            _RUN_CACHE[key] = (self.solution_count, {(i - di, j - dj): n for (i, j), n in self.true_counts.items()})
 
         if self.solution_count == 0:  # Nessuna soluzione compatibile trovata
             return None
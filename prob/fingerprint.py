@@ -0,0 +1,29 @@
+# Impronta (fingerprint) dello stato di conoscenza, usata come chiave delle cache di reasoning.
+# Costruire la chiave come tupla di tuple della knowledge costa O(n_row * n_col) a ogni
+# chiamata; l'impronta invece è lo XOR degli hash di tutte le celle (i, j, valore) e si
+# aggiorna in O(1) a ogni modifica: si toglie (XOR) l'hash del vecchio valore e si
+# aggiunge quello del nuovo. Chi modifica la knowledge (es. l'agente) la tiene aggiornata
+# e la passa a compute_cell_probs / pick_min_risk.
+# L'impronta è stabile all'interno di un processo (hash di Python), che è quanto basta
+# per chiavi di cache in memoria.
+
+def cell_hash(i, j, value):
+    """Hash del contributo della cella (i, j) con il valore dato."""
+    return hash((i, j, value))
+
+def knowledge_fingerprint(knowledge):
+    """
+    Calcola da zero l'impronta di una griglia di knowledge.
+    Coincide con quella mantenuta incrementalmente con update_fingerprint.
+    """
+    fp = 0
+    for i, row in enumerate(knowledge):
+        for j, value in enumerate(row):
+            fp ^= cell_hash(i, j, value)
+    return fp
+
+def update_fingerprint(fp, i, j, old_value, new_value):
+    """Restituisce l'impronta dopo che la cella (i, j) è passata da old_value a new_value."""
+    if old_value == new_value:
+        return fp
+    return fp ^ cell_hash(i, j, old_value) ^ cell_hash(i, j, new_value)
@@ -4,19 +4,24 @@
 # separatamente su sottoinsiemi indipendenti della frontiera.
 
 from collections import defaultdict, deque
+from .grid_index import build_neighbor_index
+
+# Memo delle componenti per stato della griglia, indicizzato su (chiave della knowledge, mine note).
+# La chiave della knowledge è la tupla di tuple della griglia oppure, se il chiamante la fornisce,
+# la sua impronta incrementale (vedi prob/fingerprint.py), che evita di ricopiare la griglia.
+_COMPONENTS_CACHE = {}
+_COMPONENTS_CACHE_MAX = 256  # oltre questa soglia si scarta la voce più vecchia (FIFO)
+
+def clear_cache():
+    """Svuota il memo delle componenti di frontiera (utile nei test)."""
+    _COMPONENTS_CACHE.clear()
 
 def neighbors(n_row, n_col, i, j):
     """
     Generatore che restituisce le coordinate delle 8 celle adiacenti a (i, j),
     restando nei limiti della griglia.
     """
-    for di in (-1, 0, 1):
-        for dj in (-1, 0, 1):
-            if di == 0 and dj == 0:
-                continue # salto la cella centrale stessa
-            r, c = i + di, j + dj
-            if 0 <= r < n_row and 0 <= c < n_col:
-                yield (r, c)
+    yield from build_neighbor_index(n_row, n_col)[i * n_col + j]
 
 def build_constraints(knowledge, mine_cells):
     """
@@ -39,6 +44,7 @@ def build_constraints(knowledge, mine_cells):
     constraints = [] # lista dei vincoli locali (uno per ogni cella numerica)
     unknowns = set() # tutte le celle ignote che compaiono almeno in un vincolo
     mine_set = set(mine_cells or []) # per sicurezza, se mine_cells è None
+    nbr_index = build_neighbor_index(n_row, n_col) # vicini precalcolati di ogni cella
 
     for i in range(n_row):
         for j in range(n_col):
@@ -48,7 +54,7 @@ def build_constraints(knowledge, mine_cells):
                 unk = [] # lista delle celle ignote adiacenti
                 known_mines = 0 # quante mine già note ci sono attorno
                 # Conta le celle ignote e le mine note adiacenti
-                for r, c in neighbors(n_row, n_col, i, j):
+                for r, c in nbr_index[i * n_col + j]:
                     if knowledge[r][c] == "?":
                         unk.append((r, c))
                     elif knowledge[r][c] == "X" or (r, c) in mine_set:
@@ -116,18 +122,45 @@ def connected_components_from_constraints(constraints):
         components.append((comp_vars, comp_cons))
     return components
 
-def frontier_components(knowledge, mine_cells):
+def frontier_components(knowledge, mine_cells, fingerprint=None):
     """
     Funzione di convenienza: costruisce i vincoli dalla knowledge e restituisce
     le componenti connesse della frontiera (variabili + vincoli).
     Se non ci sono vincoli, restituisce lista vuota.
     Punto di ingresso tipico: dato lo stato della griglia e le mine già note,
     restituisce una lista di componenti, ognuna delle quali può essere risolta separatamente.
+
+    Il risultato è memoizzato sullo stato (knowledge, mine_cells): chiamate ripetute sulla
+    stessa griglia non rifanno la scansione. Ogni chiamata restituisce comunque set e dict
+    nuovi, quindi il chiamante può modificarli senza toccare la cache.
+    fingerprint: impronta della knowledge (opzionale), usata come chiave al posto della griglia.
+    """
+    return [(set(vars_), [{"vars": set(c["vars"]), "count": c["count"]} for c in cons])
+            for vars_, cons in frontier_components_readonly(knowledge, mine_cells, fingerprint)]
+
+def frontier_components_readonly(knowledge, mine_cells, fingerprint=None):
+    """
+    Come frontier_components, ma restituisce direttamente le componenti memoizzate,
+    senza copiarle: variabili e variabili dei vincoli sono frozenset costruiti una volta
+    sola per stato della griglia. Da usare solo in lettura (es. compute_cell_probs).
+    Il risultato è una tupla di (frozenset variabili, tupla di vincoli {"vars": frozenset, "count": int}).
     """
-    constraints, _ = build_constraints(knowledge, mine_cells)
-    if not constraints:
-        return []
-    comps = connected_components_from_constraints(constraints)
-    # Filtra eventuali componenti vuote (dovrebbero essere rare)
-    comps = [c for c in comps if c[0]]
-    return comps
\ No newline at end of file
+    if fingerprint is not None:
+        # Chiave O(1): l'impronta, più le dimensioni per non confondere griglie diverse
+        key_knowledge = ("fp", fingerprint, len(knowledge), len(knowledge[0]))
+    else:
+        key_knowledge = tuple(map(tuple, knowledge))
+    key = (key_knowledge, frozenset(mine_cells or ()))
+    comps = _COMPONENTS_CACHE.get(key)
+    if comps is None:
+        constraints, _ = build_constraints(knowledge, key[1])
+        if constraints:
+            # Filtra eventuali componenti vuote (dovrebbero essere rare)
+            comps = tuple((frozenset(vars_), tuple({"vars": frozenset(c["vars"]), "count": c["count"]} for c in cons))
+                          for vars_, cons in connected_components_from_constraints(constraints) if vars_)
+        else:
+            comps = ()
+        if len(_COMPONENTS_CACHE) >= _COMPONENTS_CACHE_MAX:
+            del _COMPONENTS_CACHE[next(iter(_COMPONENTS_CACHE))]  # Scarto la voce inserita per prima
+        _COMPONENTS_CACHE[key] = comps
+    return comps
@@ -0,0 +1,54 @@
+# Indice precalcolato dei vicini di ogni cella della griglia.
+# Le funzioni di reasoning (frontiera, pressione locale, tie-break) visitano le 8 celle
+# adiacenti di moltissime celle, a ogni chiamata: invece di ricalcolare ogni volta offset
+# e controlli sui bordi, l'elenco dei vicini viene costruito una sola volta per dimensione
+# di griglia e poi solo letto.
+
+from functools import lru_cache
+
+@lru_cache(maxsize=None)
+def build_neighbor_index(n_row, n_col):
+    """
+    Costruisce l'indice dei vicini per una griglia n_row x n_col.
+    Restituisce una tupla indicizzata dall'id piatto della cella (i * n_col + j):
+    l'elemento in posizione i * n_col + j è la tupla delle coordinate (r, c)
+    delle celle adiacenti a (i, j), già filtrate sui bordi della griglia,
+    nello stesso ordine del generatore neighbors (riga per riga).
+    Il risultato è memoizzato per dimensione di griglia.
+    """
+    index = []
+    for i in range(n_row):
+        for j in range(n_col):
+            index.append(tuple((i + di, j + dj)
+                               for di in (-1, 0, 1) for dj in (-1, 0, 1)
+                               if not (di == 0 and dj == 0)
+                               and 0 <= i + di < n_row and 0 <= j + dj < n_col))
+    return tuple(index)
+
+@lru_cache(maxsize=None)
+def build_neighbor_ids(n_row, n_col):
+    """
+    Come build_neighbor_index, ma i vicini sono dati come id piatti (r * n_col + c) invece
+    che come coordinate: servono per leggere maschere piatte (bytearray) e griglie appiattite
+    senza costruire tuple. Memoizzato per dimensione di griglia.
+    """
+    return tuple(tuple(r * n_col + c for r, c in nbrs) for nbrs in build_neighbor_index(n_row, n_col))
+
+def cell_mask(n_row, n_col, cells):
+    """
+    Maschera piatta (bytearray di n_row * n_col byte) con 1 nelle posizioni delle celle date:
+    il test di appartenenza diventa mask[i * n_col + j] invece di (i, j) in set.
+    """
+    mask = bytearray(n_row * n_col)
+    for i, j in cells or ():
+        mask[i * n_col + j] = 1
+    return mask
+
+@lru_cache(maxsize=None)
+def build_cell_coords(n_row, n_col):
+    """
+    Tupla delle coordinate (i, j) di tutte le celle, indicizzata dall'id piatto i * n_col + j.
+    Le tuple sono costruite una volta per dimensione di griglia e poi riusate: convertire un
+    id piatto in coordinate diventa una lettura per indice invece di un divmod che alloca.
+    """
+    return tuple((i, j) for i in range(n_row) for j in range(n_col))
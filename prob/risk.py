@@ -2,6 +2,7 @@
 # - compute_cell_probs: calcola la probabilità che ogni cella "?" sia una mina,
 #   combinando enumerazione esatta, prior globale e pressione locale.
 # - pick_min_risk: sceglie la cella "?" a rischio minimo, con tie-break informativo.
+# - pick_min_risk_batch: k scelte a rischio minimo sulla stessa griglia, con tie-break casuale.
 #
 # Il reasoning si basa su:
 #   - Enumerazione esatta per componenti di frontiera piccole (tramite ExactEnumeration)
@@ -15,11 +16,13 @@ import random
 
 EPS = 1e-12
 
-from .frontier import frontier_components
+from .frontier import frontier_components_readonly
 from .exact import ExactEnumeration
+from .grid_index import build_neighbor_index, build_neighbor_ids, build_cell_coords, cell_mask
 
 def compute_cell_probs(knowledge, mine_cells=None, total_mines=None,
-                       max_vars_exact=22, max_solutions=200000, calibrate=True):
+                       max_vars_exact=22, max_solutions=200000, calibrate=True,
+                       fingerprint=None):
     """
     Calcola la probabilità P(mina) per ogni cella "?" della griglia.
 
@@ -34,6 +37,8 @@ def compute_cell_probs(knowledge, mine_cells=None, total_mines=None,
     max_vars_exact: soglia per usare enumerazione esatta
     max_solutions: limite di soluzioni per enumerazione esatta
     calibrate: se True, ricalibra le probabilità per rispettare il budget di mine
+    fingerprint: impronta incrementale della knowledge (opzionale, vedi prob/fingerprint.py),
+                 usata come chiave delle cache al posto della copia della griglia
     
     Restituisce:
         - probs: dizionario {(i,j): p} con la probabilità che la cella sia mina
@@ -43,15 +48,18 @@ def compute_cell_probs(knowledge, mine_cells=None, total_mines=None,
     mine_cells = set(mine_cells or [])
 
     # --- helper locali ---
-    def neighbors8(i, j):
-        # Generatore delle 8 celle adiacenti a (i,j)
-        for di in (-1, 0, 1):
-            for dj in (-1, 0, 1):
-                if di == 0 and dj == 0:
-                    continue
-                r, c = i + di, j + dj # Calcolo coordinate della cella vicina
-                if 0 <= r < n_row and 0 <= c < n_col:
-                    yield (r, c) # Ritorno solo se dentro i limiti della griglia
+    # Maschera delle mine note e griglia appiattita: nei cicli sui vicini i test diventano
+    # letture per indice (id piatto i * n_col + j) invece di lookup di tuple in un set
+    mine_mask = cell_mask(n_row, n_col, mine_cells)
+    flat = [cell for row in knowledge for cell in row]
+    # Tabelle precalcolate per questa dimensione di griglia (le stesse dimensioni si ripetono
+    # per tutta la partita): vicini come id piatti e coordinate di ogni id
+    nbr_ids = build_neighbor_ids(n_row, n_col)
+    coords = build_cell_coords(n_row, n_col)
+
+    # Rapporto need/denom di ogni cella numerica, calcolato alla prima richiesta e poi riusato:
+    # più ignote adiacenti allo stesso numero leggono lo stesso valore
+    num_ratio = {}
 
     def local_pressure_prob(v):
         """
@@ -87,29 +95,31 @@ def compute_cell_probs(knowledge, mine_cells=None, total_mines=None,
         """
         i, j = v # Estraggo le coordinate della cella da valutare
         ratios = [] # Lista dei rapporti pressione calcolati per ogni numero adiacente
-        for r, c in neighbors8(i, j): # Scorro tutte le celle adiacenti a v
-            cell = knowledge[r][c] # Prendo il valore della cella adiacente
+        for k in nbr_ids[i * n_col + j]: # Scorro tutte le celle adiacenti a v (id piatti)
+            cell = flat[k] # Prendo il valore della cella adiacente
             if isinstance(cell, int) and cell >= 0: # Se è una cella numerica rivelata
-                neigh = list(neighbors8(r, c)) # Prendo tutte le celle adiacenti a questa cella numerica
-                # Conta quante mine già note ci sono attorno a (r, c)
-                known_mines = sum((nr, nc) in mine_cells for (nr, nc) in neigh) # Conteggio mine già note attorno
-                # Lista delle celle ignote (non ancora marcate come mine) attorno a (r, c)
-                unknowns = [(nr, nc) for (nr, nc) in neigh
-                            if knowledge[nr][nc] == "?" and (nr, nc) not in mine_cells]
-                need = max(0, cell - known_mines) # Numero di mine che mancano ancora da mettere attorno a (r, c)
-                denom = max(1, len(unknowns)) # Numero di ignote attorno (almeno 1 per evitare divisione per zero)
-                ratio = need / denom # Rapporto pressione locale
-                # Clamp tra 0 e 1 per sicurezza numerica
-                if ratio < 0.0: ratio = 0.0
-                if ratio > 1.0: ratio = 1.0
+                ratio = num_ratio.get(k)
+                if ratio is None: # Rapporto della cella k non ancora calcolato
+                    neigh = nbr_ids[k] # Prendo tutte le celle adiacenti a questa cella numerica
+                    # Conta quante mine già note ci sono attorno alla cella k
+                    known_mines = sum(mine_mask[n] for n in neigh) # Conteggio mine già note attorno
+                    # Numero di celle ignote (non ancora marcate come mine) attorno alla cella k
+                    n_unknowns = sum(1 for n in neigh if flat[n] == "?" and not mine_mask[n])
+                    need = max(0, cell - known_mines) # Numero di mine che mancano ancora da mettere attorno alla cella k
+                    denom = max(1, n_unknowns) # Numero di ignote attorno (almeno 1 per evitare divisione per zero)
+                    ratio = need / denom # Rapporto pressione locale
+                    # Clamp tra 0 e 1 per sicurezza numerica
+                    if ratio < 0.0: ratio = 0.0
+                    if ratio > 1.0: ratio = 1.0
+                    num_ratio[k] = ratio # Lo salvo: le ignote vicine allo stesso numero lo riusano
                 ratios.append(ratio) # Aggiungo il rapporto alla lista
         if not ratios:
             return None # Nessuna informazione locale: v non è adiacente a nessun numero
         return sum(ratios) / len(ratios) # Faccio la media delle pressioni locali
 
     # --- ignote candidate ---
-    unknown = [(i, j) for i in range(n_row) for j in range(n_col)
-               if knowledge[i][j] == "?" and (i, j) not in mine_cells] # Tutte le celle "?" non già marcate come mine
+    unknown = [coords[k] for k, cell in enumerate(flat)
+               if cell == "?" and not mine_mask[k]] # Tutte le celle "?" non già marcate come mine
     if not unknown:
         return {} # Se non ci sono celle ignote, ritorno dizionario vuoto
 
@@ -121,8 +131,15 @@ def compute_cell_probs(knowledge, mine_cells=None, total_mines=None,
         mines_remaining = None # Se non so il totale, non posso calcolare il budget
         p0_fallback = 0.5  # Prior di default se non si sa nulla
 
+    # --- caso senza numeri visibili (es. inizio partita): prior uniforme ---
+    # Senza celle numeriche non ci sono vincoli né pressione locale: il risultato è il prior
+    # uniforme su tutte le ignote, quindi si evitano frontiera, enumerazione e calibrazione.
+    if not any(isinstance(cell, int) for cell in flat):
+        p_uniform = p0_fallback if mines_remaining is None else min(max(p0_fallback, 0.0), 1.0)
+        return {v: p_uniform for v in unknown}
+
     # --- frontiera: enumerazione esatta dove possibile ---
-    comps = frontier_components(knowledge, mine_cells)  # Trovo le componenti di frontiera
+    comps = frontier_components_readonly(knowledge, mine_cells, fingerprint)  # Trovo le componenti di frontiera (memoizzate, sola lettura)
     probs = {} # Dizionario delle probabilità finali per ogni cella
     frontier_vars = set() # Celle che fanno parte della frontiera
     exact_vars = set() # Celle per cui ho una marginale esatta
@@ -163,32 +180,30 @@ def compute_cell_probs(knowledge, mine_cells=None, total_mines=None,
 
     # --- raffinamento locale (solo celle non-esatte) ---
     ALPHA = 0.7  # Peso della pressione locale rispetto al prior
-    for v in unknown:
-        if v in exact_vars:
-            continue # Salto le celle già coperte da enumerazione esatta
+    W_PRIOR = 1.0 - ALPHA  # Peso del prior, calcolato una volta sola
+    flex = [v for v in unknown if v not in exact_vars] # Celle non coperte da enumerazione esatta
+    S_flex = 0.0 # Somma delle probabilità flessibili, accumulata nello stesso passaggio del blending
+    for v in flex:
         pv = probs.get(v, p0_fallback) # Prior corrente per la cella
         lp = local_pressure_prob(v) # Calcolo la pressione locale
         if lp is not None:
-            probs[v] = (1.0 - ALPHA) * pv + ALPHA * lp  # Media pesata tra prior e pressione locale
-        else:
-            probs[v] = pv # Se non ho pressione locale, lascio il prior
+            pv = W_PRIOR * pv + ALPHA * lp  # Media pesata tra prior e pressione locale
+        probs[v] = pv # Se non ho pressione locale, lascio il prior
+        S_flex += pv
 
     # --- ricalibrazione soft SOLO su celle non-esatte ---
-    if calibrate and (mines_remaining is not None) and unknown:
-        flex = [u for u in unknown if u not in exact_vars] # Celle su cui posso ancora agire
-        if flex:
-            S_exact = sum(probs[u] for u in exact_vars)  # Somma delle probabilità esatte
-            S_flex  = sum(probs.get(u, p0_fallback) for u in flex) # Somma delle probabilità flessibili
-            target_flex = max(0.0, mines_remaining - S_exact) # Quante mine dovrebbero essere sulle celle flessibili
-            tol = 0.10 * max(1.0, target_flex)  # Tolleranza per evitare ricalibrazioni inutili
-            if S_flex > 0.0 and abs(S_flex - target_flex) > tol:
-                scale = target_flex / S_flex # Fattore di scala per ricalibrare le probabilità
-                for u in flex:
-                    p = probs.get(u, p0_fallback) * scale  # Applico la scala
-                    # Clamp
-                    if p < 0.0: p = 0.0
-                    if p > 1.0: p = 1.0
-                    probs[u] = p # Aggiorno la probabilità
+    if calibrate and (mines_remaining is not None) and flex:
+        S_exact = sum(probs[u] for u in exact_vars)  # Somma delle probabilità esatte
+        target_flex = max(0.0, mines_remaining - S_exact) # Quante mine dovrebbero essere sulle celle flessibili
+        tol = 0.10 * max(1.0, target_flex)  # Tolleranza per evitare ricalibrazioni inutili
+        if S_flex > 0.0 and abs(S_flex - target_flex) > tol:
+            scale = target_flex / S_flex # Fattore di scala per ricalibrare le probabilità
+            for u in flex:
+                p = probs[u] * scale  # Applico la scala
+                # Clamp
+                if p < 0.0: p = 0.0
+                if p > 1.0: p = 1.0
+                probs[u] = p # Aggiorno la probabilità
     return probs # Ritorno il dizionario finale delle probabilità
 
 
@@ -208,11 +223,48 @@ def pick_min_risk(knowledge, moves_made=None, mine_cells=None, **kwargs):
         - (i, j): coordinata della cella scelta
         - None se nessuna cella candidata
     """
-    n_row = len(knowledge)
+    bucket, forbidden = _min_risk_bucket(knowledge, moves_made, mine_cells, kwargs)
+    if bucket:
+        # tie-break: tra le celle a rischio minimo, scegli quella più "informativa"
+        # (a parità di score, la prima in ordine di coordinate: max restituisce il primo massimo)
+        #choice = random.choice(bucket)  # tie-break casuale (disabilitato)
+        return max(bucket, key=lambda v: _info_score(knowledge, v))
+    return _first_free_cell(knowledge, forbidden)
+
+def pick_min_risk_batch(knowledge, k, moves_made=None, mine_cells=None, rng=None, **kwargs):
+    """
+    Estrae k scelte a rischio minimo sulla stessa griglia, con tie-break casuale.
+    Le probabilità e il bucket delle celle a rischio minimo si calcolano una volta sola;
+    le k scelte sono poi estrazioni uniformi dal bucket (utile per valutazioni Monte-Carlo
+    o per verificare il comportamento del tie-break senza ripetere compute_cell_probs).
+
+    k: numero di scelte da estrarre
+    rng: generatore casuale (es. random.Random(seed)); se None usa il modulo random
+    Gli altri parametri sono gli stessi di pick_min_risk.
+
+    Restituisce:
+        - lista di k coordinate (i, j)
+        - lista vuota se nessuna cella candidata
+    """
+    rng = rng or random
+    bucket, forbidden = _min_risk_bucket(knowledge, moves_made, mine_cells, kwargs)
+    if bucket:
+        return rng.choices(bucket, k=k)  # Tutte le k estrazioni con una sola chiamata al generatore
+    fallback = _first_free_cell(knowledge, forbidden)
+    return [fallback] * k if fallback is not None else []
+
+def _min_risk_bucket(knowledge, moves_made, mine_cells, kwargs):
+    """
+    Calcola le probabilità e restituisce (bucket, forbidden):
+    - bucket: celle "?" non vietate con probabilità minima (entro EPS), in ordine di coordinate
+    - forbidden: maschera piatta delle celle vietate (mosse fatte + mine note), id i * n_col + j
+    """
     n_col = len(knowledge[0])
-    moves_made = set(moves_made or [])
     mine_cells = set(mine_cells or [])
-    forbidden = moves_made | mine_cells
+    # Una sola maschera per le celle vietate (mosse fatte + mine note), senza set intermedi
+    forbidden = cell_mask(len(knowledge), n_col, moves_made)
+    for i, j in mine_cells:
+        forbidden[i * n_col + j] = 1
 
     # Costruisci i parametri per compute_cell_probs
     max_vars_exact = kwargs.get("max_vars_exact", 22)
@@ -225,27 +277,32 @@ def pick_min_risk(knowledge, moves_made=None, mine_cells=None, **kwargs):
         total_mines=total_mines,
         max_vars_exact=max_vars_exact,
         max_solutions=max_solutions,
-        calibrate=True
+        calibrate=True,
+        fingerprint=kwargs.get("fingerprint")
     )
 
     # Filtra le celle candidate (non vietate e ancora ignote)
     candidates = [(p, v) for v, p in probs.items()
-              if v not in forbidden and knowledge[v[0]][v[1]] == "?"]
-    if candidates:
-        # tie-break: tra le celle a rischio minimo, scegli quella più "informativa"
-        pmin = min(p for p, _ in candidates)
-        bucket = [v for p, v in candidates if abs(p - pmin) <= EPS]
-        #choice = random.choice(bucket)  # tie-break casuale (disabilitato)
-        choice = max(bucket, key=lambda v: _info_score(knowledge, v))
-        if DEBUG_RISK:
-            top = sorted(candidates, key=lambda x: x[0])[:5]
-            print("[RISK] min=", round(pmin, 4), "bucket=", bucket, "top5=", [(v, round(p,3)) for p, v in top])
-        return choice
-
-    # fallback: prima "?" libera trovata (in ordine di scansione)
-    for i in range(n_row):
-        for j in range(n_col):
-            if knowledge[i][j] == "?" and (i, j) not in forbidden:
+              if not forbidden[v[0] * n_col + v[1]] and knowledge[v[0]][v[1]] == "?"]
+    if not candidates:
+        return [], forbidden
+    pmin = min(candidates)[0]
+    threshold = pmin + EPS # Soglia del bucket dei minimi (p >= pmin sempre)
+    # Ordinato per coordinate: l'ordine di probs dipende dall'iterazione dei set delle componenti
+    # (anche di quelle memoizzate), quindi senza ordinamento il tie-break di pick_min_risk
+    # (a parità di score vince la prima) e le estrazioni di pick_min_risk_batch ne dipenderebbero
+    bucket = sorted(v for p, v in candidates if p <= threshold)
+    if DEBUG_RISK:
+        top = sorted(candidates, key=lambda x: x[0])[:5]
+        print("[RISK] min=", round(pmin, 4), "bucket=", bucket, "top5=", [(v, round(p,3)) for p, v in top])
+    return bucket, forbidden
+
+def _first_free_cell(knowledge, forbidden):
+    """fallback: prima "?" libera trovata (in ordine di scansione), None se non ce ne sono."""
+    n_col = len(knowledge[0])
+    for i, row in enumerate(knowledge):
+        for j, cell in enumerate(row):
+            if cell == "?" and not forbidden[i * n_col + j]:
                 return (i, j)
     return None
 
@@ -260,26 +317,16 @@ def _info_score(knowledge, v):
     n_col = len(knowledge[0])
     i, j = v 
     s = 0  # Contatore delle celle ignote adiacenti
-    for di in (-1,0,1): 
-        for dj in (-1,0,1): 
-            if di==0 and dj==0: continue  # Salto la cella centrale
-            r, c = i+di, j+dj  # Coordinate della cella vicina
-            if 0<=r<n_row and 0<=c<n_col and knowledge[r][c] == "?":
-                s += 1  # Incremento se la cella è ignota
+    for r, c in build_neighbor_index(n_row, n_col)[i * n_col + j]:
+        if knowledge[r][c] == "?":
+            s += 1  # Incremento se la cella è ignota
     return s  # Ritorno il numero di ignote adiacenti
 
 def neighbors8(i, j, n_row, n_col):
     """
     Generatore delle 8 celle adiacenti a (i,j), restando nei limiti della griglia.
     """
-    for di in (-1, 0, 1):
-        for dj in (-1, 0, 1):
-            if di == 0 and dj == 0: 
-                continue
-            r, c = i + di, j + dj
-            if 0 <= r < n_row and 0 <= c < n_col:
-                return_cell = (r, c)
-                yield return_cell
+    yield from build_neighbor_index(n_row, n_col)[i * n_col + j]
 
 def local_pressure_prob(knowledge, mine_cells, v):
     """
@@ -293,7 +340,7 @@ def local_pressure_prob(knowledge, mine_cells, v):
     for r, c in neighbors8(i, j, n_row, n_col):  # Scorro tutte le celle adiacenti a v
         cell = knowledge[r][c]  # Prendo il valore della cella adiacente
         if isinstance(cell, int) and cell >= 0:  # Se è un numero rivelato
-            neigh = list(neighbors8(r, c, n_row, n_col))  # Celle adiacenti al numero
+            neigh = build_neighbor_index(n_row, n_col)[r * n_col + c]  # Celle adiacenti al numero
             known_mines = sum((nr, nc) in mine_cells for (nr, nc) in neigh)  # Mine note attorno
             unknowns = [(nr, nc) for (nr, nc) in neigh if knowledge[nr][nc] == "?" and (nr, nc) not in mine_cells]  # Ignote attorno
             need = max(0, cell - known_mines)  # Mine ancora da mettere
@@ -5,29 +5,43 @@ Testa su griglia 10x10 con densità mine 15% (15 mine), 100 games per strategia.
 
 from minesweeper_env import MinesweeperEnv
 from agent import Agent
+import argparse
 import time
+import random
 import statistics
 import json
 from datetime import datetime
 
+# Se False, non si misura il tempo di ogni singola mossa (solo il tempo per partita):
+# evita due letture del clock per mossa. Disattivabile con --no-move-timing.
+TIMING_DETAIL = True
+
 
 def safe_first_move(env, agent):
     """Garantisce una prima mossa sicura per qualsiasi agente."""
-    for target_value in [0, 1, None]:  # None = qualsiasi non-mina
-        for i in range(env.n_row):
-            for j in range(env.n_col):
-                cell_value = env.grid[i][j]
-                if (target_value is None and cell_value != "M") or cell_value == target_value:
-                    value = env.reveal(i, j)
-                    agent.observe(i, j, value)
-                    return i, j, value
+    cell = env.first_safe_cell()  # 0, 1, qualsiasi non-mina
+    if cell is not None:
+        i, j = cell
+        value = env.reveal(i, j)
+        agent.observe(i, j, value)
+        return i, j, value
     raise Exception("Impossibile trovare una prima mossa sicura!")
 
 
-def run_single_game(strategy, n_row, n_col, n_mines):
-    """Esegue una singola partita e restituisce le metriche."""
-    env = MinesweeperEnv(n_row, n_col, n_mines)
-    agent = Agent(n_row, n_col, strategy=strategy, total_mines=n_mines)
+def run_single_game(strategy, n_row, n_col, n_mines, env=None, agent=None):
+    """
+    Esegue una singola partita e restituisce le metriche.
+    Se env e agent sono già allocati (stesse dimensioni e strategia) vengono resettati
+    e riusati, invece di crearne di nuovi a ogni partita.
+    """
+    if env is None:
+        env = MinesweeperEnv(n_row, n_col, n_mines)
+    else:
+        env.reset()
+    if agent is None:
+        agent = Agent(n_row, n_col, strategy=strategy, total_mines=n_mines)
+    else:
+        agent.reset()
     agent.total_mines = n_mines
     agent.to_flag = n_mines
     
@@ -35,20 +49,24 @@ def run_single_game(strategy, n_row, n_col, n_mines):
     safe_first_move(env, agent)
     
     move_count = 0
-    move_times = []
+    # Somma e numero dei tempi per mossa (in ns): serve solo la media, non la lista completa
+    move_time_sum_ns = 0
+    move_time_count = 0
     cells_revealed = 1  # Prima mossa già fatta
-    game_start = time.time()
+    game_start = time.perf_counter()
     won = False
     
     while True:
-        move_start = time.time()
+        if TIMING_DETAIL:
+            move_start = time.perf_counter_ns()
         action = agent.choose_action()
-        move_end = time.time()
         
         if action is None:
             break
             
-        move_times.append(move_end - move_start)
+        if TIMING_DETAIL:
+            move_time_sum_ns += time.perf_counter_ns() - move_start
+            move_time_count += 1
         move = action[0]
         
         if move == "reveal":
@@ -85,18 +103,20 @@ def run_single_game(strategy, n_row, n_col, n_mines):
         # Controlla vittoria
         if agent.check_victory_status(env):
             # Flagga automaticamente le mine rimanenti
-            for i in range(n_row):
-                for j in range(n_col):
-                    if env.grid[i][j] == "M" and agent.knowledge[i][j] == "?":
-                        agent.mark_mine(i, j)
+            for i, j in env.mine_cells:
+                if agent.knowledge[i][j] == "?":
+                    agent.mark_mine(i, j)
             won = True
             break
             
         move_count += 1
     
-    game_end = time.time()
+    game_end = time.perf_counter()
     game_time = game_end - game_start
-    avg_move_time = statistics.mean(move_times) if move_times else 0
+    if not TIMING_DETAIL:
+        avg_move_time = None  # non misurato
+    else:
+        avg_move_time = move_time_sum_ns / move_time_count / 1e9 if move_time_count else 0
     
     return {
         'won': won,
@@ -107,8 +127,12 @@ def run_single_game(strategy, n_row, n_col, n_mines):
     }
 
 
-def run_assessment_mode(mode="mode1"):
-    """Esegue l'assessment in base alla modalità scelta."""
+def run_assessment_mode(mode="mode1", seed=None):
+    """
+    Esegue l'assessment in base alla modalità scelta.
+    Il seed (opzionale) inizializza un unico generatore per tutta la modalità,
+    condiviso da tutte le partite: con lo stesso seed l'assessment è riproducibile.
+    """
     if mode == "mode1":
         # Modalità 1: 10x10 con 15% mine, tutte le 4 strategie
         n_row, n_col = 10, 10
@@ -152,18 +176,22 @@ def run_assessment_mode(mode="mode1"):
     print()
     
     results = {}
+    rng = random.Random(seed)
     
     for i, strategy in enumerate(strategies):
         print(f"[{i+1}/{len(strategies)}] Testando strategia: {strategy}")
         
         games_data = []
         wins = 0
+        # Env e agente allocati una volta per strategia e resettati a ogni partita
+        env = MinesweeperEnv(n_row, n_col, n_mines, rng=rng)
+        agent = Agent(n_row, n_col, strategy=strategy, total_mines=n_mines)
         
         for game_num in range(n_games):
             if (game_num + 1) % 20 == 0:
                 print(f"  Game {game_num + 1}/{n_games}")
                 
-            game_result = run_single_game(strategy, n_row, n_col, n_mines)
+            game_result = run_single_game(strategy, n_row, n_col, n_mines, env=env, agent=agent)
             games_data.append(game_result)
             
             if game_result['won']:
@@ -179,8 +207,11 @@ def run_assessment_mode(mode="mode1"):
         avg_cells_revealed = statistics.mean(cells_revealed_data)
         std_cells_revealed = statistics.stdev(cells_revealed_data) if len(cells_revealed_data) > 1 else 0
         
-        avg_move_time = statistics.mean(move_time_data)
-        std_move_time = statistics.stdev(move_time_data) if len(move_time_data) > 1 else 0
+        if None in move_time_data:
+            avg_move_time = std_move_time = None  # tempo per mossa non misurato
+        else:
+            avg_move_time = statistics.mean(move_time_data)
+            std_move_time = statistics.stdev(move_time_data) if len(move_time_data) > 1 else 0
         
         avg_game_time = statistics.mean(game_time_data)
         std_game_time = statistics.stdev(game_time_data) if len(game_time_data) > 1 else 0
@@ -221,7 +252,10 @@ def print_results(results, n_row, n_col, n_mines, n_games):
         print(f"STRATEGIA: {strategy}")
         print(f"  Win Rate: {metrics['wins']}/{metrics['total_games']} ({metrics['win_rate']*100:.1f}%)")
         print(f"  Celle rivelate: {metrics['avg_cells_revealed']:.1f} ± {metrics['std_cells_revealed']:.1f}")
-        print(f"  Tempo per mossa: {metrics['avg_move_time']*1000:.2f} ± {metrics['std_move_time']*1000:.2f} ms")
+        if metrics['avg_move_time'] is None:
+            print("  Tempo per mossa: n/d (--no-move-timing)")
+        else:
+            print(f"  Tempo per mossa: {metrics['avg_move_time']*1000:.2f} ± {metrics['std_move_time']*1000:.2f} ms")
         print(f"  Tempo per partita: {metrics['avg_game_time']:.2f} ± {metrics['std_game_time']:.2f} s")
         print()
 
@@ -242,16 +276,15 @@ def save_results(results, n_row, n_col, n_mines, n_games):
         'results': results
     }
     
+    # Serializza tutto in memoria e scrive con una sola write (json.dump scriverebbe un chunk alla volta)
     with open(filename, 'w') as f:
-        json.dump(data, f, indent=2)
+        f.write(json.dumps(data, indent=2))
     
     print(f"Risultati salvati in: {filename}")
 
 
-if __name__ == "__main__":
-    start_time = time.time()
-    
-    # Chiedi all'utente quale modalità eseguire
+def _prompt():
+    """Chiede all'utente quale modalità eseguire (usato se --mode non è passato)."""
     print("Scegli modalità di assessment:")
     print("1. Modalità 1: 10x10, 15% mine, tutte le strategie")
     print("2. Modalità 2: 16x16, 20% mine, solo strategie avanzate")
@@ -260,17 +293,29 @@ if __name__ == "__main__":
     while True:
         choice = input("Inserisci la tua scelta (1-3): ").strip()
         if choice in ["1", "2", "3"]:
-            break
+            return choice
         print("Scelta non valida. Inserisci 1, 2 o 3.")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Assessment delle strategie di minesweeper.")
+    ap.add_argument("--mode", choices=["1", "2", "3"],
+                    help="modalità da eseguire senza prompt interattivo")
+    ap.add_argument("--seed", type=int, default=None,
+                    help="seed per rendere riproducibili le griglie generate")
+    ap.add_argument("--no-move-timing", action="store_true",
+                    help="non misura il tempo di ogni mossa (solo il tempo per partita)")
+    args = ap.parse_args()
+    TIMING_DETAIL = not args.no_move_timing
+
+    start_time = time.time()
+    
+    # Senza --mode si chiede all'utente quale modalità eseguire
+    choice = args.mode or _prompt()
     
     print()
     
-    if choice == "1":
-        results, n_row, n_col, n_mines, n_games = run_assessment_mode("mode1")
-    elif choice == "2":
-        results, n_row, n_col, n_mines, n_games = run_assessment_mode("mode2")
-    else:
-        results, n_row, n_col, n_mines, n_games = run_assessment_mode("mode3")
+    results, n_row, n_col, n_mines, n_games = run_assessment_mode(f"mode{choice}", seed=args.seed)
     
     print_results(results, n_row, n_col, n_mines, n_games)
     save_results(results, n_row, n_col, n_mines, n_games)
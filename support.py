@@ -2,7 +2,7 @@
 Modulo support.py - Funzioni di supporto per CSP.
 """
 
-def select_unassigned_variable(agent, unassigned, assignment):
+def select_unassigned_variable(agent, unassigned, assignment, use_degree=True):
     """
     MRV + Degree Heuristic: seleziona la variabile con meno valori nel dominio.
     
@@ -10,6 +10,7 @@ def select_unassigned_variable(agent, unassigned, assignment):
         agent: istanza dell'agente
         unassigned: lista di variabili non assegnate
         assignment: dict con assegnazioni correnti
+        use_degree: se False, salta la seconda fase (degree heuristic)
         
     Returns:
         tuple: (r, c) della variabile selezionata
@@ -23,11 +24,12 @@ def select_unassigned_variable(agent, unassigned, assignment):
     
     for var in valid_unassigned:
         legal_values = 0
+        # Si assegna var in-place e si ripristina subito dopo, invece di copiare assignment per ogni valore
         for value in agent.Domains[var]:
-            test_assignment = assignment.copy()
-            test_assignment[var] = value
-            if is_consistent_partial(agent, test_assignment):
+            assignment[var] = value
+            if is_consistent_partial(agent, assignment):
                 legal_values += 1
+        assignment.pop(var, None)
         
         if legal_values < min_values:
             min_values = legal_values
@@ -35,8 +37,8 @@ def select_unassigned_variable(agent, unassigned, assignment):
         elif legal_values == min_values:
             candidates.append(var)
     
-    # Seconda fase: degree heuristic se strategia avanzata o gac3 e necessario
-    if len(candidates) == 1 or agent.strategy not in ["backtracking_advanced", "backtracking_gac3"]:
+    # Seconda fase: degree heuristic solo se richiesta e necessaria
+    if not use_degree or len(candidates) == 1:
         return candidates[0]
     
     max_degree = -1
@@ -66,27 +68,57 @@ def calculate_degree(agent, var, unassigned, assignment):
     """
     degree = 0
     unassigned_set = agent.unknown_cells & set(unassigned)
-    x, y = var
     
-    # Ottimizzazione: controlla solo i constraints delle celle adiacenti a var
-    # Invece di iterare su tutti i constraints, guardiamo solo quelli che potrebbero contenere var
-    for dx in [-1, 0, 1]:
-        for dy in [-1, 0, 1]:
-            if dx == 0 and dy == 0:
-                continue
-                
-            nx, ny = x + dx, y + dy
-            if 0 <= nx < agent.n_row and 0 <= ny < agent.n_col:
-                # Trova constraint che ha come cella centrale (nx, ny)
-                for constraint in agent.constraints:
-                    if constraint["cell"] == (nx, ny) and var in constraint["neighbors"]:
-                        # Calcola direttamente l'intersezione escludendo var
-                        other_unassigned = (constraint["neighbors"] & unassigned_set) - {var}
-                        degree += len(other_unassigned)
+    # Ottimizzazione: si guardano solo i constraints che contengono var, tramite l'indice
+    # agent.var2constraints costruito in infer_safe_and_mines (invece di scorrere tutti i
+    # constraints per ognuna delle 8 celle adiacenti)
+    for constraint in agent.var2constraints.get(var, ()):
+        # Calcola direttamente l'intersezione escludendo var
+        other_unassigned = (constraint["neighbors"] & unassigned_set) - {var}
+        degree += len(other_unassigned)
     
     return degree
 
 
+def order_domain_values(agent, var, assignment):
+    """
+    Ordinamento dei valori per var (success prediction): prova per primo il valore
+    che ha più probabilità di portare a una soluzione.
+    Per ogni vincolo che contiene var si stima la probabilità che var sia mina come
+    (mine ancora da piazzare) / (celle ancora libere); se la media supera 0.5 conviene
+    provare prima True (mina), altrimenti prima False (sicura).
+    Il backtracking cerca solo l'esistenza di una soluzione, quindi l'ordine non cambia
+    il risultato ma riduce i rami insoddisfacibili esplorati prima di trovarla.
+    
+    Args:
+        agent: istanza dell'agente
+        var: variabile da assegnare
+        assignment: dict con assegnazioni correnti
+        
+    Returns:
+        list: [False, True] oppure [True, False]
+    """
+    unknown_cells = agent.unknown_cells
+    total = 0.0
+    n = 0
+    for constraint in agent.var2constraints.get(var, ()):
+        mines_assigned = 0
+        free = 0
+        for cell in constraint["neighbors"]:
+            value = assignment.get(cell)
+            if value is not None:
+                if value:
+                    mines_assigned += 1
+            elif cell in unknown_cells:
+                free += 1
+        if free:
+            total += (constraint["count"] - mines_assigned) / free
+            n += 1
+    if n and total / n > 0.5:
+        return [True, False]
+    return [False, True]
+
+
 def is_consistent_partial(agent, assignment):
     """
     Verifica se un'assegnazione parziale è consistente.
@@ -98,18 +130,21 @@ def is_consistent_partial(agent, assignment):
     Returns:
         bool: True se l'assegnazione è consistente
     """
+    # L'assegnazione diventa due bitmask (celle assegnate, celle assegnate a mina): per ogni
+    # vincolo i conteggi sono due popcount sulle sue maschere invece di un lookup per cella
+    n_col = agent.n_col
+    assigned_bits = 0
+    mine_bits = 0
+    for (i, j), value in assignment.items():
+        bit = 1 << (i * n_col + j)
+        assigned_bits |= bit
+        if value:
+            mine_bits |= bit
+    
     for constraint in agent.constraints:
-        assigned_in_constraint = 0
-        mines_assigned = 0
-        unassigned_in_constraint = 0
-        
-        for cell in constraint["neighbors"]:
-            if cell in assignment:
-                assigned_in_constraint += 1
-                if assignment[cell]:
-                    mines_assigned += 1
-            elif cell in agent.unknown_cells:
-                unassigned_in_constraint += 1
+        mines_assigned = (constraint["mask"] & mine_bits).bit_count()
+        # Non assegnate tra le vicine ancora sconosciute
+        unassigned_in_constraint = (constraint["umask"] & ~assigned_bits).bit_count()
         
         remaining_mines = constraint["count"] - mines_assigned
         if remaining_mines < 0 or remaining_mines > unassigned_in_constraint:
@@ -129,11 +164,10 @@ def is_consistent(agent, assignment):
     Returns:
         bool: True se l'assegnazione è consistente
     """
+    # Le mine dell'assegnazione si raccolgono una volta sola: per ogni vincolo basta
+    # la dimensione dell'intersezione, calcolata in C invece che cella per cella
+    mines = frozenset(cell for cell, value in assignment.items() if value)
     for constraint in agent.constraints:
-        mine_count = 0
-        for cell in constraint["neighbors"]:
-            if cell in assignment and assignment[cell]:
-                mine_count += 1
-        if mine_count != constraint["count"]:
+        if len(constraint["neighbors"] & mines) != constraint["count"]:
             return False
     return True
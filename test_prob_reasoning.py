@@ -20,9 +20,9 @@ from math import isclose
 
 sys.path.append(".")  # Permette di importare moduli locali dal progetto
 
-from prob.risk import compute_cell_probs, pick_min_risk  # Funzioni principali da testare
+from prob.risk import compute_cell_probs, pick_min_risk, pick_min_risk_batch  # Funzioni principali da testare
 from prob.frontier import frontier_components            # Per decomporre la frontiera in componenti
-from prob.exact import ExactEnumeration                  # Per enumerazione esatta delle soluzioni
+from prob.exact import ExactEnumeration, clear_cache, _RUN_CACHE  # Per enumerazione esatta delle soluzioni (e il suo memo)
 
 EPS = 1e-12  # Tolleranza numerica per confronti tra float
 
@@ -457,6 +457,58 @@ def test_inconsistency_fallback_prior():
         assert 0.0 <= p <= 1.0
 
 
+# TEST 13: Memo dell'enumerazione esatta
+def test_exact_enumeration_memo():
+    """
+    Si verifica che il memo di ExactEnumeration restituisca, per una componente
+    già enumerata, esattamente lo stesso risultato dell'enumerazione da zero,
+    anche se i vincoli sono passati in un ordine diverso, e che la seconda
+    chiamata sia davvero servita dal memo (senza rienumerare).
+    """
+    K = [
+        [1, "?", 1],
+        ["?", 2, "?"],
+        [1, "?", 1],
+    ]
+    vars_, cons = frontier_components(K, set())[0]
+    clear_cache()
+    fresh = ExactEnumeration(vars_, cons).run()
+    size = len(_RUN_CACHE)
+    # La seconda istanza deve essere servita dal memo: se provasse a enumerare, il test fallisce
+    second = ExactEnumeration(vars_, list(reversed(cons)))
+    def no_enumerate():
+        raise AssertionError("run() ha rienumerato invece di usare il memo")
+    second._enumerate = no_enumerate
+    cached = second.run()
+    print("Fresh:", fresh)
+    print("Cached:", cached)
+    assert len(_RUN_CACHE) == size  # Nessuna nuova voce: stessa firma
+    assert cached == fresh
+
+
+# TEST 14: Scelte multiple a rischio minimo (tie-break casuale)
+def test_pick_min_risk_batch_tiebreak():
+    """
+    Si verifica che pick_min_risk_batch, calcolando le probabilità una volta sola,
+    estragga k scelte tutte nel bucket delle celle a rischio minimo (le 4 "?" simmetriche),
+    che con lo stesso seed le estrazioni si ripetano e che il bucket venga esplorato.
+    """
+    import random
+    K = [
+        [1, "?", 1],
+        ["?", 2, "?"],
+        [1, "?", 1],
+    ]
+    moves = {(i, j) for i in range(3) for j in range(3) if K[i][j] != "?"}
+    picks = pick_min_risk_batch(K, 40, moves_made=moves, rng=random.Random(0))
+    again = pick_min_risk_batch(K, 40, moves_made=moves, rng=random.Random(0))
+    print("Picks:", picks)
+    assert len(picks) == 40
+    assert set(picks) <= {(0, 1), (1, 0), (1, 2), (2, 1)}
+    assert len(set(picks)) > 1
+    assert picks == again
+
+
 # Main
 if __name__ == "__main__":
     # Lista di tutti i test da eseguire
@@ -473,6 +525,8 @@ if __name__ == "__main__":
         test_symmetry_3x3_and_informative_tiebreak,
         test_symmetry_4x4_internals_equal,
         test_inconsistency_fallback_prior,
+        test_exact_enumeration_memo,
+        test_pick_min_risk_batch_tiebreak,
     ]
     failures = 0
     # Esegue ogni test e stampa il risultato
@@ -1,7 +1,14 @@
 from minesweeper_env import MinesweeperEnv
 from agent import Agent
+from multiprocessing import Pool
+import argparse
+import random
 import time
 
+# Se False, non si stampano i messaggi informativi durante la partita (prima mossa, stato
+# intermedio): restano solo gli esiti finali. Utile per lanciare molte partite di fila.
+VERBOSE = False
+
 
 def safe_first_move(env, agent):
     """
@@ -16,22 +23,21 @@ def safe_first_move(env, agent):
         tuple: (x, y, value) della cella rivelata
     """
     # Cerca in ordine: 0, 1, qualsiasi non-mina
-    for target_value in [0, 1, None]:  # None = qualsiasi non-mina
-        for i in range(env.n_row):
-            for j in range(env.n_col):
-                cell_value = env.grid[i][j]
-                if (target_value is None and cell_value != "M") or cell_value == target_value:
-                    print(f"Prima mossa sicura: cella ({i}, {j}) con valore {cell_value}")
-                    value = env.reveal(i, j)
-                    agent.observe(i, j, value)
-                    return i, j, value
+    cell = env.first_safe_cell()
+    if cell is not None:
+        i, j = cell
+        value = env.reveal(i, j)
+        if VERBOSE:
+            print(f"Prima mossa sicura: cella ({i}, {j}) con valore {value}")
+        agent.observe(i, j, value)
+        return i, j, value
     
     # Questo non dovrebbe mai succedere in una griglia valida
     raise Exception("Impossibile trovare una prima mossa sicura!")
 
 
 def choose_agent_configuration():
-    """Permette all'utente di configurare l'agente."""
+    """Permette all'utente di configurare l'agente (restituisce la strategia scelta)."""
     print("=== CONFIGURAZIONE AGENTE ===")
     print("1. Random Agent")
     print("2. Backtracking CSP (base)")
@@ -40,106 +46,167 @@ def choose_agent_configuration():
     
     while True:
         choice = input("Scegli configurazione (1-4): ").strip()
-        if choice == "1":
-            return Agent(n_row, n_col, strategy="random")
-        elif choice == "2":
-            return Agent(n_row, n_col, strategy="backtracking")
-        elif choice == "3":
-            return Agent(n_row, n_col, strategy="backtracking_advanced")
-        elif choice == "4":
-            return Agent(n_row, n_col, strategy="backtracking_gac3")
-        else:
-            print("Scelta non valida. Inserisci un numero da 1 a 4.")
+        if choice in STRATEGIES:
+            return STRATEGIES[choice]
+        print("Scelta non valida. Inserisci un numero da 1 a 4.")
 
 
-n_row, n_col, m = 16, 16, 40  # Dimensione della griglia (r x c) e numero di mine m
+def play_one(seed=None, strategy="backtracking", report=True):
+    """
+    Gioca una partita completa su una griglia n_row x n_col con m mine.
+    
+    Args:
+        seed: seed della griglia (None = random globale, griglia non riproducibile)
+        strategy: strategia dell'agente
+        report: se True stampa l'esito finale della partita
+        
+    Returns:
+        dict: seed, esito (won), numero di mosse e tempo di gioco in secondi
+    """
+    env = MinesweeperEnv(n_row, n_col, m, rng=random.Random(seed) if seed is not None else None)
+    agent = Agent(n_row, n_col, strategy=strategy, total_mines=m)
+
+    if VERBOSE:
+        print(f"\nUsando strategia: {agent.strategy}")
+    """print("\nGriglia reale:")
+    env.print_grid()
+    print()"""
+
+    # Convenzione minesweeper: la prima mossa è sempre sicura
+    safe_first_move(env, agent)
+    # Celle sicure ancora da rivelare: aggiornato a ogni rivelazione, così la vittoria si
+    # controlla in O(1) invece di scorrere tutta la griglia dopo ogni mossa
+    safe_remaining = n_row * n_col - m - 1
+
+    if VERBOSE:
+        print("Stato agente dopo prima mossa:")
+        agent.print_grid()
+        print()
+
+    move_count = 0
+    won = False
+    # Metodi e griglia usati a ogni mossa, letti una volta sola invece che attributo per attributo
+    # (agent.knowledge è modificata sul posto, quindi il riferimento resta valido per tutta la partita)
+    reveal = env.reveal
+    observe = agent.observe
+    knowledge = agent.knowledge
+    # ciclo di gioco
+    start = time.perf_counter()
+    while True:
 
-# Configura l'agente
-agent = choose_agent_configuration()
-
-env = MinesweeperEnv(n_row, n_col, m)
-
-agent.total_mines = m
-agent.to_flag = m
-
-print(f"\nUsando strategia: {agent.strategy}")
-"""print("\nGriglia reale:")
-env.print_grid()
-print()"""
-
-# Convenzione minesweeper: la prima mossa è sempre sicura
-safe_first_move(env, agent)
-
-print("Stato agente dopo prima mossa:")
-agent.print_grid()
-print()
-
-move_count = 0
-# ciclo di gioco
-start = time.time()
-while True:
-
-    action = agent.choose_action()
-    if action is None:
-        print("Nessuna mossa da fare.")
-        break
-
-    move = action[0]
-    if move == "reveal":
-        x, y = action[1], action[2]
-        value = env.reveal(x, y)
-        if value == "M":
-            print(f"BOOM! Cella ({x}, {y}) era una mina!")
-            agent.observe(x, y, value)
-            print("\nStato finale:")
-            agent.print_grid()
-            print("\nGAME OVER.")
+        action = agent.choose_action()
+        if action is None:
+            if report:
+                print("Nessuna mossa da fare.")
             break
 
-        if value is not None:
-            agent.observe(x, y, value)
-
-    elif move == "reveal_all_safe":
-        safe_cells = action[1]
-        game_over = False
-        for x, y in safe_cells:
-            value = env.reveal(x, y)
+        move = action[0]
+        if move == "reveal":
+            x, y = action[1], action[2]
+            value = reveal(x, y)
             if value == "M":
-                print(f"ERRORE: Cella ({x}, {y}) doveva essere sicura ma era una mina!")
-                agent.observe(x, y, value)
-                print("\nStato finale:")
-                #agent.print_grid()
-                print("\nGAME OVER.")
-                game_over = True
+                observe(x, y, value)
+                if report:
+                    print(f"BOOM! Cella ({x}, {y}) era una mina!")
+                    print("\nStato finale:")
+                    agent.print_grid()
+                    print("\nGAME OVER.")
                 break
-            
+
             if value is not None:
-                agent.observe(x, y, value)
-        
-        if game_over:
-            break
+                if knowledge[x][y] in ("?", "X"):
+                    safe_remaining -= 1  # Cella sicura rivelata per la prima volta
+                observe(x, y, value)
+
+        elif move == "reveal_all_safe":
+            safe_cells = action[1]
+            game_over = False
+            for x, y in safe_cells:
+                value = reveal(x, y)
+                if value == "M":
+                    observe(x, y, value)
+                    if report:
+                        print(f"ERRORE: Cella ({x}, {y}) doveva essere sicura ma era una mina!")
+                        print("\nStato finale:")
+                        #agent.print_grid()
+                        print("\nGAME OVER.")
+                    game_over = True
+                    break
+                
+                if value is not None:
+                    if knowledge[x][y] in ("?", "X"):
+                        safe_remaining -= 1  # Cella sicura rivelata per la prima volta
+                    observe(x, y, value)
+            
+            if game_over:
+                break
 
-    elif move == "flag_all":
-        mine_cells = action[1]
-        for x, y in mine_cells:
-            agent.mark_mine(x, y)
+        elif move == "flag_all":
+            mine_cells = action[1]
+            for x, y in mine_cells:
+                agent.mark_mine(x, y)
 
-    #agent.print_grid()
-    #print()
+        #agent.print_grid()
+        #print()
 
-    # Controlla se l'agente ha vinto
-    if agent.check_victory_status(env):
-        # Se ha vinto, flagga automaticamente tutte le mine rimanenti
-        for i in range(n_row):
-            for j in range(n_col):
-                if env.grid[i][j] == "M" and agent.knowledge[i][j] == "?":
+        # Controlla se l'agente ha vinto (la scansione completa solo quando il contatore arriva a zero)
+        if safe_remaining == 0 and agent.check_victory_status(env):
+            # Se ha vinto, flagga automaticamente tutte le mine rimanenti
+            # (la differenza tra insiemi, fatta in C, scarta subito le mine già note all'agente)
+            for i, j in env.mine_cells - agent.mine_cells:
+                if knowledge[i][j] == "?":
                     agent.mark_mine(i, j)
+            
+            won = True
+            if report:
+                agent.print_grid()
+                print(f"\n HAI VINTO IN {move_count} MOSSE!")
+            break
         
-        agent.print_grid()
-        print(f"\n HAI VINTO IN {move_count} MOSSE!")
-        break
-    
-    move_count += 1
+        move_count += 1
+
+    elapsed = time.perf_counter() - start
+    if report:
+        print("\n Tempo trascorso:", elapsed, "secondi")
+    return {"seed": seed, "won": won, "moves": move_count, "time": elapsed}
+
+
+def _play_quiet(seed, strategy):
+    """Partita senza output, per l'esecuzione in parallelo (deve stare a livello di modulo per il Pool)."""
+    return play_one(seed, strategy, report=False)
+
+
+n_row, n_col, m = 16, 16, 40  # Dimensione della griglia (r x c) e numero di mine m
 
-end = time.time()
-print("\n Tempo trascorso:", end - start, "secondi")
+STRATEGIES = {
+    "1": "random",
+    "2": "backtracking",
+    "3": "backtracking_advanced",
+    "4": "backtracking_gac3",
+}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Partite di minesweeper con l'agente scelto.")
+    ap.add_argument("-n", type=int, default=1,
+                    help="numero di partite (con n > 1 si giocano in parallelo e si stampa solo il riepilogo)")
+    ap.add_argument("--strategy", choices=list(STRATEGIES.values()),
+                    help="strategia dell'agente senza prompt interattivo")
+    ap.add_argument("--seed", type=int, default=None,
+                    help="seed della (prima) griglia; con n > 1 le partite usano seed, seed+1, ...")
+    args = ap.parse_args()
+
+    # Configura l'agente
+    strategy = args.strategy or choose_agent_configuration()
+
+    if args.n <= 1:
+        play_one(args.seed, strategy)
+    else:
+        # Le partite sono indipendenti: un processo per core, senza riavviare l'interprete per ognuna
+        first = args.seed if args.seed is not None else 0
+        with Pool() as pool:
+            results = pool.starmap(_play_quiet, [(first + k, strategy) for k in range(args.n)])
+        wins = sum(r["won"] for r in results)
+        print(f"\nStrategia: {strategy} - {args.n} partite su {n_row}x{n_col} con {m} mine")
+        print(f"Vittorie: {wins}/{args.n} ({100 * wins / args.n:.1f}%)")
+        print(f"Tempo medio per partita: {sum(r['time'] for r in results) / args.n:.3f} secondi")